@@ -0,0 +1,169 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from enablers.excel import extract_pdf_records, write_consolidated_report
+from enablers.text import load_page_selection
+from parsers.lexicon import lexicon_fingerprint
+from utils import consolidate_records
+
+#definir le répertoire de base (un niveau au-dessus de 'src')
+BASE_DIR = Path(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+SHARD_DIR = BASE_DIR / 'outputs/shards'
+# a incrementer quand le contenu des shards change: les shards d'une autre version sont recalcules
+SHARD_VERSION = 1
+
+
+def find_archive_pdfs(root_directory):
+    """
+    parcourt toute l'arborescence donnee et retourne les fichiers pdf trouves, tries par chemin
+    les fichiers intermediaires (sections, texte, shards) sont nommes d'apres le nom du pdf,
+    donc un nom deja vu dans un autre dossier est ignore
+
+    :param root_directory: racine de l'archive (ex: un dossier par annee)
+    :return: liste des chemins des pdfs
+    """
+    pdfs = {}
+    for pdf_path in sorted(Path(root_directory).rglob('*.pdf')):
+        if pdf_path.name in pdfs:
+            print(f"Nom de fichier en double ignoré : {pdf_path} (déjà trouvé : {pdfs[pdf_path.name]})")
+            continue
+        pdfs[pdf_path.name] = pdf_path
+    return list(pdfs.values())
+
+
+def check_shard_manifest(shard_dir):
+    """
+    les shards dependent des lexiques des fournisseurs (parsers/lexicons) et du format des shards
+    (SHARD_VERSION): si l'un d'eux a change depuis leur creation, ils sont supprimes pour etre recalcules.
+    l'empreinte courante est notee dans le manifeste.
+    """
+    manifest_path = Path(shard_dir) / 'manifest.json'
+    expected = {'version': SHARD_VERSION, 'lexicons': lexicon_fingerprint()}
+
+    manifest = {}
+    if manifest_path.exists():
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            manifest = {}
+
+    if manifest != expected:
+        stale = list(Path(shard_dir).glob('*.pkl'))
+        if stale and manifest:
+            print(f"Lexiques ou format des shards modifiés, {len(stale)} shards seront recalculés")
+        for shard_path in stale + list(Path(shard_dir).glob('*.key.json')):
+            shard_path.unlink()
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(expected, f)
+
+
+def shard_key(pdf_path):
+    """
+    ce dont depend le shard d'un pdf en plus de son contenu: la version des shards et la selection de pages
+    du fichier dans .config/page_selection.json (None quand toutes les pages sont traitees)
+    """
+    return {'version': SHARD_VERSION, 'pages': load_page_selection().get(Path(pdf_path).name)}
+
+
+def process_shard(pdf_path, shard_dir):
+    """
+    etape "map": extrait les sections et le texte d'un pdf puis enregistre ses chaines dans un shard
+    le shard est reutilise tant qu'il est plus recent que le pdf et que sa cle (shard_key) n'a pas change
+
+    :param pdf_path: chemin du fichier pdf
+    :param shard_dir: repertoire des shards
+    :return: le chemin du shard
+    """
+    pdf_path = Path(pdf_path)
+    shard_path = Path(shard_dir) / (pdf_path.stem + '.pkl')
+    # un fichier par shard: les processus n'ecrivent jamais le meme fichier
+    key_path = Path(shard_dir) / (pdf_path.stem + '.key.json')
+    key = shard_key(pdf_path)
+
+    if shard_path.exists() and shard_path.stat().st_mtime >= pdf_path.stat().st_mtime and key_path.exists():
+        try:
+            with open(key_path, 'r', encoding='utf-8') as f:
+                up_to_date = json.load(f) == key
+        except (json.JSONDecodeError, OSError):
+            up_to_date = False
+        if up_to_date:
+            print(f"Shard à jour pour {pdf_path.name}, extraction ignorée")
+            return shard_path
+
+    records = extract_pdf_records(pdf_path)
+    records.to_pickle(shard_path)
+    with open(key_path, 'w', encoding='utf-8') as f:
+        json.dump(key, f)
+    return shard_path
+
+
+def merge_shards(shard_paths, channel_grouping_df, output_path, export_formats=(), write_xlsx=True):
+    """
+    etape "reduce": combine les shards, fusionne les doublons, applique le groupement des chaines
+    et ecrit les feuilles Consolidated et Summary en une seule fois
+
+    :param shard_paths: chemins des shards, dans l'ordre des pdfs
+    :param channel_grouping_df: DataFrame contenant les informations de groupement des chaînes
+    :param output_path: chemin du fichier excel a generer
+    :param export_formats: formats d'export supplementaires ('csv', 'jsonl', 'parquet')
+    :param write_xlsx: ecrire le fichier excel
+    :return: le chemin du fichier genere, ou None en cas d'echec
+    """
+    frames = [pd.read_pickle(shard_path) for shard_path in shard_paths]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        print("Aucune donnée trouvée dans les shards.")
+        return None
+
+    final_df = consolidate_records(frames, channel_grouping_df)
+    if final_df is None:
+        return None
+
+    return write_consolidated_report(final_df, output_path, export_formats=export_formats, write_xlsx=write_xlsx)
+
+
+def run_archive(root_directory, channel_grouping_df, output_path, jobs=None, export_formats=(), write_xlsx=True):
+    """
+    traite une arborescence de pdfs historiques: un shard par pdf en parallele, puis une fusion unique
+
+    :param root_directory: racine de l'archive
+    :param channel_grouping_df: DataFrame contenant les informations de groupement des chaînes
+    :param output_path: chemin du fichier excel a generer
+    :param jobs: nombre maximal de processus (par defaut le nombre de coeurs)
+    :param export_formats: formats d'export supplementaires ('csv', 'jsonl', 'parquet')
+    :param write_xlsx: ecrire le fichier excel
+    :return: le chemin du fichier genere, ou None en cas d'echec
+    """
+    pdfs = find_archive_pdfs(root_directory)
+    if not pdfs:
+        print(f"Aucun fichier pdf trouvé dans {root_directory}")
+        return None
+
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    check_shard_manifest(SHARD_DIR)
+    os.makedirs(BASE_DIR / 'outputs/section', exist_ok=True)
+    os.makedirs(BASE_DIR / 'outputs/text', exist_ok=True)
+
+    print(f"Traitement de {len(pdfs)} fichiers pdf avec {jobs or os.cpu_count()} processus...")
+    shard_paths = [None] * len(pdfs)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(process_shard, str(pdf_path), str(SHARD_DIR)): index
+                   for index, pdf_path in enumerate(pdfs)}
+        for future in as_completed(futures):
+            pdf_path = pdfs[futures[future]]
+            try:
+                shard_paths[futures[future]] = future.result()
+                print(f"Shard terminé : {pdf_path.name}")
+            except Exception as e:
+                # un pdf illisible ne doit pas interrompre tout l'historique
+                print(f"Erreur en traitant {pdf_path}: {e}")
+
+    # garder l'ordre des pdfs pour que la fusion soit deterministe
+    shard_paths = [shard_path for shard_path in shard_paths if shard_path is not None]
+    return merge_shards(shard_paths, channel_grouping_df, output_path, export_formats, write_xlsx)
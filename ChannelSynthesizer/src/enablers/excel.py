@@ -1,39 +1,125 @@
 from pathlib import Path
 import os
 import pandas as pd
-from utils import get_provider_and_year, read_section_names, parse_tsv, find_file_pairs, create_consolidated_excel
+from utils import get_provider_and_year, read_section_names, parse_tsv, find_file_pairs, create_consolidated_excel, \
+    build_channel_records, create_summary_table, expand_region_mask, filter_invalid_channels, apply_compact_schema, \
+    RECORD_COLUMNS
+from enablers.sections import process_file as process_section_file
+from enablers.text import process_pdf
+from enablers.store import store_offers
+from enablers.export import EXPORT_DIR, export_tables
 
 #definir le répertoire de base (un niveau au-dessus de 'src')
 BASE_DIR = Path(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
-def generate_excel_report(output_directory, channel_grouping_df):
+
+def load_provider_data(section_file, text_file):
     """
-    genere un rapport Excel consolide a partir des fichiers de section et de texte.
+    lit une paire de fichiers section/texte et retourne les donnees attendues par build_channel_records
 
-    :param output_directory: repertoire contenant les fichiers de sortie
-    :param channel_grouping_df: DataFrame contenant les informations de groupement des chaînes
-    :return: Le chemin vers le fichier Excel genere
+    :param section_file: fichier des noms de sections
+    :param text_file: fichier texte extrait du pdf
+    :return: tuple (provider, year, data, section_names, filename), ou None si aucune donnee n'est trouvee
+    """
+    provider, year = get_provider_and_year(text_file.stem)
+    section_names = read_section_names(section_file)
+    data = parse_tsv(text_file, section_names, provider)
+    if not data:
+        print(f"Pas de data trouvé pour le fournisseur: {provider}, année: {year}")
+        return None
+
+    print(f"Extraction des données pour le fournisseur: {provider}, année: {year}, taille des data: {len(data)}")
+    return provider, year, data, section_names, text_file.name
+
+
+def extract_pdf_records(pdf_path):
+    """
+    extrait les sections et le texte d'un seul pdf sans interaction, puis retourne ses enregistrements de chaines
+
+    :param pdf_path: chemin du fichier pdf
+    :return: DataFrame des chaines du fichier (vide si aucune donnee n'est trouvee)
+    """
+    pdf_path = Path(pdf_path)
+
+    # pas d'interaction: selection de pages configuree, sinon toutes les pages
+    process_section_file(str(pdf_path), interactive=False)
+    process_pdf(str(pdf_path))
+
+    section_file = BASE_DIR / 'outputs/section' / f'{pdf_path.stem}_sections.tsv'
+    text_file = BASE_DIR / 'outputs/text' / f'{pdf_path.stem}_text.tsv'
+    provider_data = load_provider_data(section_file, text_file)
+    if provider_data:
+        return build_channel_records(*provider_data)
+    return pd.DataFrame(columns=RECORD_COLUMNS)
+
+
+def write_consolidated_report(final_df, output_path, base_offer_df=None, export_formats=(), write_xlsx=True,
+                              export_directory=EXPORT_DIR):
+    """
+    filtre les chaines non valides et ecrit les feuilles Consolidated et Summary en une seule passe
+
+    :param final_df: DataFrame consolide (colonne masque 'Regions')
+    :param output_path: chemin du fichier excel a generer
+    :param base_offer_df: donnees de l'offre BASE a ajouter apres le nettoyage, optionnel
+    :param export_formats: formats supplementaires ('csv', 'jsonl', 'parquet') des memes tables
+    :param write_xlsx: ecrire le fichier excel (False pour n'ecrire que les exports)
+    :param export_directory: dossier des exports, 'outputs/export' par defaut
+    :return: le chemin du fichier genere (le fichier excel, ou le dossier d'export sans excel)
+    """
+    final_df = filter_invalid_channels(final_df)
+    if base_offer_df is not None and not base_offer_df.empty:
+        final_df = apply_compact_schema(pd.concat([final_df, base_offer_df], ignore_index=True))
+
+    summary_df = create_summary_table(final_df)
+
+    if write_xlsx:
+        with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
+            expand_region_mask(final_df).to_excel(writer, sheet_name='Consolidated', index=False)
+            summary_df.to_excel(writer, sheet_name='Summary', index=False)
+
+        print(f"rapport excel consolide cree a : {output_path}")
+
+    if export_formats:
+        export_tables(final_df, summary_df, export_formats, export_directory, name=Path(output_path).stem)
+        if not write_xlsx:
+            output_path = export_directory
+
+    # garder les offres dans la base sqlite pour les requetes
+    store_offers(final_df)
+    return output_path
+
+
+def load_all_provider_data():
+    """
+    lit toutes les paires de fichiers section/texte deja extraites
+
+    :return: liste des donnees attendues par build_channel_records, une entree par fichier
     """
     section_dir = BASE_DIR / 'outputs/section'
     text_dir = BASE_DIR / 'outputs/text'
-    output_path = Path(output_directory) / 'xlsx/consolidated_report.xlsx'
 
     all_data = []
 
     #lire et traiter les données des fournisseurs
     for section_file, text_file in find_file_pairs(section_dir, text_dir):
-        provider, year = get_provider_and_year(text_file.stem)
-        section_names = read_section_names(section_file)
-        data = parse_tsv(text_file, section_names, provider)
-        filename = text_file.name
-        if data:
-            print(f"Extraction des données pour le fournisseur: {provider}, année: {year}, taille des data: {len(data)}")
-            all_data.append((provider, year, data, section_names, filename))
-        else:
-            print(f"Pas de data trouvé pour le fournisseur: {provider}, année: {year}")
+        provider_data = load_provider_data(section_file, text_file)
+        if provider_data:
+            all_data.append(provider_data)
+    return all_data
+
+
+def generate_excel_report(output_directory, channel_grouping_df):
+    """
+    genere un rapport Excel consolide a partir des fichiers de section et de texte.
+
+    :param output_directory: repertoire contenant les fichiers de sortie
+    :param channel_grouping_df: DataFrame contenant les informations de groupement des chaînes
+    :return: Le chemin vers le fichier Excel genere
+    """
+    output_path = Path(output_directory) / 'xlsx/consolidated_report.xlsx'
 
     #creer le rapport Excel consolide
-    create_consolidated_excel(all_data, output_path, channel_grouping_df)
+    create_consolidated_excel(load_all_provider_data(), output_path, channel_grouping_df)
 
     #renvoyer le chemin du fichier excel généré
     return output_path
@@ -0,0 +1,122 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils import expand_region_mask
+
+# formats machine des tables Consolidated et Summary, en plus du fichier excel
+EXPORT_FORMATS = ['csv', 'jsonl', 'parquet']
+
+#definir le répertoire de base (un niveau au-dessus de 'src')
+BASE_DIR = Path(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+EXPORT_DIR = BASE_DIR / 'outputs/export'
+
+
+def prepare_table(df):
+    """
+    met la table au format d'export: régions depliees comme dans la feuille excel,
+    colonnes categorielles remises en objets pour garder le meme schema dans tous les morceaux
+    """
+    df = expand_region_mask(df) if 'Regions' in df.columns else df
+    return df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+
+
+def iter_chunks(df, chunk_column=None):
+    """
+    decoupe le DataFrame en morceaux a ecrire l'un apres l'autre: une suite de lignes de la meme periode
+    fournisseur par morceau, sans changer l'ordre des lignes du rapport excel
+    """
+    if chunk_column is None or chunk_column not in df.columns or df.empty:
+        yield df
+        return
+    values = df[chunk_column].fillna('')
+    bounds = np.r_[np.flatnonzero((values != values.shift()).to_numpy()), len(df)]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        yield df.iloc[start:stop]
+
+
+def write_csv(df, path, chunk_column=None):
+    """ecrit les morceaux dans un fichier csv, l'en-tete avec le premier morceau"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for index, chunk in enumerate(iter_chunks(df, chunk_column)):
+            chunk.to_csv(f, index=False, header=index == 0)
+
+
+def write_jsonl(df, path, chunk_column=None):
+    """ecrit les morceaux dans un fichier json lines, une offre par ligne"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for chunk in iter_chunks(df, chunk_column):
+            if not chunk.empty:
+                f.write(chunk.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n') + '\n')
+
+
+def write_parquet(df, path, chunk_column=None):
+    """ecrit les morceaux dans un fichier parquet, un groupe de lignes par morceau"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # schema deduit de toute la table: un morceau sans groupe de chaines ne doit pas changer les types
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_chunks(df, chunk_column):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet,
+}
+
+
+def export_table(df, path, file_format, chunk_column=None):
+    """
+    ecrit une table dans le format demande, morceau par morceau, via un fichier temporaire
+    pour qu'un lecteur ne voie jamais un fichier a moitie ecrit
+
+    :return: le chemin du fichier, ou None si le format n'est pas disponible
+    """
+    if file_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("pyarrow n'est pas installé, l'export parquet est ignoré.")
+            return None
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        WRITERS[file_format](prepare_table(df), temp_path, chunk_column)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return path
+
+
+def export_tables(consolidated_df, summary_df, formats, export_directory=EXPORT_DIR, name='consolidated_report'):
+    """
+    exporte les tables Consolidated et Summary dans les formats donnes
+    la table Consolidated a les memes colonnes que la feuille excel (régions depliees)
+
+    :param consolidated_df: DataFrame consolide
+    :param summary_df: tableau de synthese
+    :param formats: liste de formats parmi EXPORT_FORMATS
+    :param export_directory: dossier des fichiers exportes
+    :param name: prefixe des fichiers (ex: 'consolidated_report' -> consolidated_report.csv, consolidated_report_summary.csv)
+    :return: liste des fichiers ecrits
+    """
+    os.makedirs(export_directory, exist_ok=True)
+    written = []
+    for file_format in formats:
+        for table, suffix, chunk_column in [(consolidated_df, '', 'Provider_Period'),
+                                            (summary_df, '_summary', None)]:
+            path = export_table(table, Path(export_directory) / f"{name}{suffix}.{file_format}", file_format,
+                                chunk_column)
+            if path:
+                written.append(path)
+
+    if written:
+        print(f"{len(written)} fichiers exportés dans {export_directory}")
+    return written
@@ -5,28 +5,36 @@ from parsers.all_sections_parser import extract_text, parse, get_provider_colors
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
 
-def process(folder_path: str) -> None:
-    for file in os.listdir(folder_path):
-        if file.endswith(".pdf"):
-            path = os.path.join(folder_path, file)
-            try:
-                provider, year = detect_provider_and_year(path)
-                colors = get_provider_colors(provider)
-                pages = get_pages_to_process(path)
+def process_file(path: str, interactive: bool = True) -> None:
+    """
+    extrait et sauvegarde les sections d'un seul fichier pdf
+    :param path: chemin du fichier pdf
+    :param interactive: si False, toutes les pages sont traitees quand aucune selection n'est configuree
+    """
+    provider, year = detect_provider_and_year(path)
+    colors = get_provider_colors(provider)
+    pages = get_pages_to_process(path, interactive)
+
+    all_sections = []
 
-                all_sections = []
+    for page_number in pages:
+        text, max_size = extract_text(path, colors, provider, page_number)
+        sections = parse(text, provider, max_size)
+        all_sections.extend(sections)
 
-                for page_number in pages:
-                    text, max_size = extract_text(path, colors, provider, page_number)
-                    sections = parse(text, provider, max_size)
-                    all_sections.extend(sections)
+    all_sections = remove_redundant_sections(all_sections)
 
-                all_sections = remove_redundant_sections(all_sections)
+    output_path = os.path.join(BASE_DIR, 'outputs/section')
+    save_sections(path, all_sections, output_dir=output_path)
+    print(f"Saved sections for {os.path.basename(path)} for provider {provider} and year {year}")
 
-                output_path = os.path.join(BASE_DIR, 'outputs/section')
-                save_sections(path, all_sections, output_dir=output_path)
-                print(f"Saved sections for {file} for provider {provider} and year {year}")
 
+def process(folder_path: str) -> None:
+    for file in os.listdir(folder_path):
+        if file.endswith(".pdf"):
+            path = os.path.join(folder_path, file)
+            try:
+                process_file(path)
             except ValueError as e:
                 print(f"Error processing {file}: {e}")
 
@@ -0,0 +1,232 @@
+import argparse
+import json
+import multiprocessing
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from enablers.excel import extract_pdf_records
+from enablers.store import query_offers, counts_by_period
+from enablers.watch import BrochureWatcher, file_fingerprint
+
+# service local: n'ecoute que sur la machine
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+
+QUERY_FILTERS = ['channel', 'provider', 'period', 'region', 'basic_option', 'tv_radio']
+
+
+class ConsolidationService(BrochureWatcher):
+    """
+    garde un processus chaud (pymupdf, pandas, groupement des chaînes, chaines deja extraites, offre BASE)
+    pour qu'une nouvelle brochure ne coute que son extraction et la fusion, sans relancer python main.py.
+    les operations qui modifient l'etat sont executees une a la fois, les requetes sur la base en parallele.
+    """
+
+    def __init__(self, pdf_directory, grouping_directory, output_path, base_offer_loader=None, export_formats=(),
+                 write_xlsx=True):
+        super().__init__(pdf_directory, grouping_directory, output_path, base_offer_loader, export_formats,
+                         write_xlsx)
+        self.lock = threading.Lock()
+
+    def warm_up(self):
+        """charge le groupement, l'offre BASE et les chaines des pdfs deja presents"""
+        with self.lock:
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            self.refresh_grouping()
+            self.refresh_base_offer()
+            for pdf_path in sorted(self.pdf_directory.glob('*.pdf')):
+                self.pending[pdf_path.name] = file_fingerprint(pdf_path)
+                self.ingest(pdf_path.name)
+            self.rebuild_report()
+
+    def ingest_pdf(self, pdf_path, rebuild=True):
+        """
+        extrait un pdf (dans le dossier surveille ou ailleurs) et met a jour le rapport si demande
+
+        :param pdf_path: chemin du fichier pdf
+        :param rebuild: regenerer le rapport consolidé apres l'extraction
+        :return: dictionnaire decrivant le resultat
+        """
+        pdf_path = Path(pdf_path)
+        if not pdf_path.is_file():
+            raise FileNotFoundError(f"Fichier introuvable : {pdf_path}")
+
+        with self.lock:
+            print(f"Extraction de {pdf_path.name}...")
+            records = extract_pdf_records(pdf_path)
+            self.records[pdf_path.name] = records
+            self.fingerprints[pdf_path.name] = file_fingerprint(pdf_path)
+            self.report_outdated = True
+            report = self._rebuild() if rebuild else None
+        return {'pdf': pdf_path.name, 'channels': len(records), 'report': report}
+
+    def rebuild(self):
+        """recharge le groupement si besoin et regenere le rapport consolidé"""
+        with self.lock:
+            if self.refresh_grouping():
+                self.report_outdated = True
+            return {'report': self._rebuild()}
+
+    def _rebuild(self):
+        self.rebuild_report()
+        if self.report_outdated:
+            return None
+        return str(self.output_path)
+
+    def status(self):
+        """etat du processus: fichiers charges et groupement utilise"""
+        return {
+            'grouping_file': str(self.grouping_file) if self.grouping_file else None,
+            'pdfs': {name: len(records) for name, records in sorted(self.records.items())},
+            'report': str(self.output_path),
+            'report_outdated': self.report_outdated,
+        }
+
+
+def make_handler(service):
+    """cree la classe de requete http liee au service"""
+
+    class ServiceRequestHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if url.path == '/status':
+                self._answer(service.status)
+            elif url.path == '/offers':
+                filters = {key: params.get(key) for key in QUERY_FILTERS}
+                self._answer(lambda: query_offers(**filters).to_dict(orient='records'))
+            elif url.path == '/counts':
+                include_radio = params.get('include_radio', '').lower() in ('1', 'true', 'yes')
+                self._answer(lambda: counts_by_period(include_radio).to_dict(orient='records'))
+            else:
+                self._send(404, {'error': f"chemin inconnu : {url.path}"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError as e:
+                self._send(400, {'error': f"json invalide : {e}"})
+                return
+
+            if url.path == '/ingest':
+                if 'path' not in payload:
+                    self._send(400, {'error': "le champ 'path' est obligatoire"})
+                    return
+                self._answer(lambda: service.ingest_pdf(payload['path'], payload.get('rebuild', True)))
+            elif url.path == '/rebuild':
+                self._answer(service.rebuild)
+            else:
+                self._send(404, {'error': f"chemin inconnu : {url.path}"})
+
+        def _answer(self, action):
+            try:
+                self._send(200, action())
+            except FileNotFoundError as e:
+                self._send(404, {'error': str(e)})
+            except (KeyError, ValueError) as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                print(f"Erreur du service : {e}")
+                self._send(500, {'error': str(e)})
+
+        def _send(self, code, body):
+            data = json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            print(f"{self.address_string()} - {format % args}")
+
+    return ServiceRequestHandler
+
+
+def serve(service, host=SERVICE_HOST, port=SERVICE_PORT):
+    """prechauffe le service puis repond aux requetes jusqu'a interruption (Ctrl+C)"""
+    service.warm_up()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Service de consolidation à l'écoute sur http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Service arrêté.")
+    finally:
+        server.server_close()
+
+
+def call_service(endpoint, payload=None, params=None, host=SERVICE_HOST, port=SERVICE_PORT, timeout=600):
+    """
+    appelle le service local depuis un autre script
+
+    :param endpoint: '/ingest', '/rebuild', '/offers', '/counts' ou '/status'
+    :param payload: corps json pour les requetes POST (None pour un GET)
+    :param params: parametres de la requete GET
+    :return: la reponse json decodee
+    :raises ConnectionError: si le service ne repond pas
+    """
+    url = f"http://{host}:{port}{endpoint}"
+    if params:
+        url += '?' + '&'.join(f"{key}={urllib.request.quote(str(value))}"
+                              for key, value in params.items() if value is not None)
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read() or b'{}')
+    except urllib.error.URLError as e:
+        raise ConnectionError(f"Service de consolidation injoignable sur {url} : {e.reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Client du service de consolidation local.")
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help="extrait un pdf et met à jour le rapport")
+    ingest_parser.add_argument('pdf')
+    ingest_parser.add_argument('--no-rebuild', action='store_true')
+
+    subparsers.add_parser('rebuild', help="régénère le rapport consolidé")
+    subparsers.add_parser('status', help="état du service")
+
+    offers_parser = subparsers.add_parser('offers', help="liste des offres filtrées")
+    for name in QUERY_FILTERS:
+        offers_parser.add_argument(f"--{name.replace('_', '-')}")
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'ingest':
+            result = call_service('/ingest', {'path': str(Path(args.pdf).resolve()), 'rebuild': not args.no_rebuild},
+                                  host=args.host, port=args.port)
+        elif args.command == 'rebuild':
+            result = call_service('/rebuild', {}, host=args.host, port=args.port)
+        elif args.command == 'status':
+            result = call_service('/status', host=args.host, port=args.port)
+        else:
+            result = call_service('/offers', params={name: getattr(args, name) for name in QUERY_FILTERS},
+                                  host=args.host, port=args.port)
+    except ConnectionError as e:
+        print(e)
+        raise SystemExit(1)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if isinstance(result, dict) and 'error' in result:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    # l'OCR des pdfs ingeres tourne dans un pool de processus
+    multiprocessing.freeze_support()
+    main()
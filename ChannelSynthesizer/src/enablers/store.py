@@ -0,0 +1,199 @@
+import argparse
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from utils import ensure_region_columns_exist, REGION_FLANDERS, REGION_BRUSSELS, REGION_WALLONIA, \
+    REGION_GERMANOPHONE
+
+# base sqlite locale des offres consolidées, a cote des rapports excel
+DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../outputs/offers.db'))
+
+REGION_NAMES = {
+    'flanders': REGION_FLANDERS,
+    'brussels': REGION_BRUSSELS,
+    'wallonia': REGION_WALLONIA,
+    'germanophone': REGION_GERMANOPHONE,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS offers (
+    id INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    channel_group TEXT,
+    provider TEXT NOT NULL,
+    period TEXT NOT NULL,
+    provider_period TEXT NOT NULL,
+    regions INTEGER NOT NULL,
+    basic_option TEXT,
+    tv_radio TEXT,
+    hd_sd TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_offers_channel_group ON offers (channel_group COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_offers_channel ON offers (channel COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_offers_provider_period ON offers (provider, period);
+CREATE INDEX IF NOT EXISTS idx_offers_period ON offers (period, basic_option);
+""" + "".join(
+    f"CREATE INDEX IF NOT EXISTS idx_offers_region_{name} ON offers ((regions & {bit}));\n"
+    for name, bit in REGION_NAMES.items()
+)
+
+
+def connect(db_path=DB_PATH):
+    """ouvre la base et cree le schema si necessaire"""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def store_offers(consolidated_df, db_path=DB_PATH):
+    """
+    enregistre les offres consolidées dans la base, une periode fournisseur a la fois
+    les lignes d'une periode deja presente sont remplacees, les autres periodes ne sont pas touchees:
+    ajouter une nouvelle periode est donc une simple insertion
+
+    :param consolidated_df: DataFrame consolide (masque 'Regions' ou colonnes de région larges)
+    :param db_path: chemin de la base sqlite
+    :return: nombre de lignes enregistrées
+    """
+    df = ensure_region_columns_exist(consolidated_df.copy())
+    df = df.dropna(subset=['Channel', 'Provider_Period'])
+    provider_period = df['Provider_Period'].astype(str).str.rsplit(' ', n=1, expand=True)
+
+    rows = pd.DataFrame({
+        'channel': df['Channel'].astype(str),
+        'channel_group': df['Channel Group Level'] if 'Channel Group Level' in df.columns else None,
+        'provider': provider_period[0],
+        'period': provider_period[1] if provider_period.shape[1] > 1 else '',
+        'provider_period': df['Provider_Period'].astype(str),
+        'regions': df['Regions'].astype(int),
+        'basic_option': df['Basic/Option'],
+        'tv_radio': df['TV/Radio'],
+        'hd_sd': df['HD/SD'],
+    })
+    rows = rows.astype(object).where(rows.notna(), None)
+
+    columns = list(rows.columns)
+    insert = f"INSERT INTO offers ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
+    with closing(connect(db_path)) as connection, connection:
+        for period, period_rows in rows.groupby('provider_period', sort=False):
+            connection.execute("DELETE FROM offers WHERE provider_period = ?", (period,))
+            connection.executemany(insert, period_rows.itertuples(index=False, name=None))
+
+    print(f"{len(rows)} offres enregistrées dans {db_path}")
+    return len(rows)
+
+
+def query_offers(channel=None, provider=None, period=None, region=None, basic_option=None, tv_radio=None,
+                 db_path=DB_PATH):
+    """
+    recherche les offres selon les criteres donnes (tous optionnels)
+
+    :param channel: nom de chaine ou groupe de chaines (insensible a la casse)
+    :param provider: nom du fournisseur (ex: 'Orange')
+    :param period: annee (ex: '2024')
+    :param region: 'flanders', 'brussels', 'wallonia' ou 'germanophone'
+    :param basic_option: 'Basic' ou 'Option'
+    :param tv_radio: 'TV' ou 'Radio'
+    :return: DataFrame des offres trouvées
+    """
+    conditions = []
+    params = []
+    if channel:
+        conditions.append("(channel_group = ? COLLATE NOCASE OR channel = ? COLLATE NOCASE)")
+        params.extend([channel, channel])
+    if provider:
+        conditions.append("provider = ?")
+        params.append(provider)
+    if period:
+        conditions.append("period = ?")
+        params.append(str(period))
+    if region:
+        bit = REGION_NAMES[region.lower()]
+        # meme expression que les index idx_offers_region_*, pour que sqlite les utilise
+        conditions.append(f"(regions & {bit}) = {bit}")
+    if basic_option:
+        conditions.append("basic_option = ?")
+        params.append(basic_option)
+    if tv_radio:
+        conditions.append("tv_radio = ?")
+        params.append(tv_radio)
+
+    query = "SELECT channel, channel_group, provider, period, regions, basic_option, tv_radio, hd_sd FROM offers"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY provider, period, channel"
+
+    with closing(connect(db_path)) as connection:
+        return pd.read_sql_query(query, connection, params=params)
+
+
+def providers_carrying(channel, region=None, period=None, db_path=DB_PATH):
+    """retourne les fournisseurs qui proposent une chaine, eventuellement pour une region et une annee"""
+    offers = query_offers(channel=channel, region=region, period=period, db_path=db_path)
+    return sorted(offers['provider'].unique())
+
+
+def counts_by_period(include_radio=False, db_path=DB_PATH):
+    """
+    compte les groupes de chaines Basic et Option par periode fournisseur, avec les memes regles que la
+    feuille Summary: chaque groupe de chaines est compte une fois par periode, selon sa premiere ligne
+
+    :param include_radio: compter aussi les chaines radio
+    :return: DataFrame avec une ligne par periode
+    """
+    radio_filter = "" if include_radio else "WHERE tv_radio IS NULL OR tv_radio != 'Radio'"
+    query = f"""
+        SELECT provider_period,
+               SUM(basic_option = 'Basic') AS Basic,
+               SUM(basic_option = 'Option') AS Option
+        FROM offers
+        WHERE id IN (SELECT MIN(id) FROM offers {radio_filter} GROUP BY provider_period, channel_group)
+        GROUP BY provider_period
+        ORDER BY provider_period
+    """
+
+    with closing(connect(db_path)) as connection:
+        counts = pd.read_sql_query(query, connection)
+    counts['Grand Total'] = counts['Basic'] + counts['Option']
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requêtes sur la base des offres consolidées.")
+    parser.add_argument('--db', default=DB_PATH, help="chemin de la base sqlite")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    providers_parser = subparsers.add_parser('providers', help="fournisseurs qui proposent une chaîne")
+    providers_parser.add_argument('channel')
+    providers_parser.add_argument('--region', choices=sorted(REGION_NAMES))
+    providers_parser.add_argument('--period')
+
+    offers_parser = subparsers.add_parser('offers', help="liste des offres filtrées")
+    offers_parser.add_argument('--channel')
+    offers_parser.add_argument('--provider')
+    offers_parser.add_argument('--period')
+    offers_parser.add_argument('--region', choices=sorted(REGION_NAMES))
+    offers_parser.add_argument('--basic-option', choices=['Basic', 'Option'])
+    offers_parser.add_argument('--tv-radio', choices=['TV', 'Radio'])
+
+    counts_parser = subparsers.add_parser('counts', help="nombre de chaînes Basic/Option par période")
+    counts_parser.add_argument('--include-radio', action='store_true')
+
+    args = parser.parse_args()
+    if args.command == 'providers':
+        for provider in providers_carrying(args.channel, args.region, args.period, db_path=args.db):
+            print(provider)
+    elif args.command == 'offers':
+        print(query_offers(args.channel, args.provider, args.period, args.region, args.basic_option,
+                           args.tv_radio, db_path=args.db).to_string(index=False))
+    elif args.command == 'counts':
+        print(counts_by_period(args.include_radio, db_path=args.db).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import os
 import json
+import multiprocessing
 import re
 
 import fitz
@@ -7,6 +8,7 @@ from parsers.providers.orange import parse_orange_pdf
 from parsers.providers.voo import parse_voo_pdf
 from parsers.providers.telenet import parse_telenet_pdf
 from parsers.all_sections_parser import detect_provider_and_year
+from parsers.lexicon import substring_matcher
 from utils import read_section_names
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
@@ -71,21 +73,12 @@ def add_tv_radio_codes(tsv_path, section_names):
             processed_lines.append(f"{stripped_line} TV\n")
 
     # gérer des cas spécifiques ou des chaines devraient être tv au lieu de radio
-    channels_to_correct = [
-        "National Geographic", "Ketnet", "STAR channel", "Plattelands TV", "vtm Gold",
-        "BBC Entertainment", "Disney Channel VL", "BBC First", "Nickelodeon NL", "Nick Jr NL",
-        "Nickelodeon Ukraine", "Disney JR NL", "Play6", "MENT TV", "Q-music", "Play Crime",
-        "MTV", "TLC", "Comedy Central", "Eclips TV", "VTM non stop dokters", "History",
-        "Play 7", "Cartoon Network", "Vlaams Parlement TV", "ID", "OUTtv", "Play Sports Info",
-        "Al Aoula Europe", "2M Monde", "Al Maghreb TV", "TRT Turk", "MBC", "TV Polonia",
-        "Rai Uno", "Rai Due", "Rai Tre", "Mediaset Italia", "TVE Internacional",
-        "The Israëli Network", "BBC One", "BBC Two", "NPO 1", "NPO 2", "NPO 3", "ARD", "ZDF", "VOX"
-    ]
+    channels_to_correct = substring_matcher('tv_radio', 'tv_channels')
 
     final_lines = []
     for line in processed_lines:
         # vérifier si la ligne correspond à une des chaines à corriger en tv
-        if any(channel in line for channel in channels_to_correct):
+        if channels_to_correct.search(line):
             final_lines.append(re.sub(r' R$', ' TV', line))
         else:
             final_lines.append(line)
@@ -95,47 +88,56 @@ def add_tv_radio_codes(tsv_path, section_names):
 
     print(f"codes tv/radio traitées et enregistrées dans {tsv_path}")
 
-def process_pdfs(directory):
+def process_pdf(pdf_path):
     """
-    cette fonction traite tous les fichiers pdf dans le répertoire donné.
-    directory c'est le répertoire contenant les fichiers pdf
+    cette fonction extrait le texte d'un seul fichier pdf selon son fournisseur et applique le marquage tv/radio
+    pdf_path c'est le chemin du fichier pdf, les noms de section doivent deja etre extraits
     """
-    for filename in os.listdir(directory):
-        if filename.endswith(".pdf"):
-            pdf_path = os.path.join(directory, filename)
-            try:
-                provider, year = detect_provider_and_year(pdf_path)
-                document = fitz.open(pdf_path)
-                total_pages = document.page_count
-                document.close()
+    filename = os.path.basename(pdf_path)
+    provider, year = detect_provider_and_year(pdf_path)
+    document = fitz.open(pdf_path)
+    total_pages = document.page_count
+    document.close()
 
 
-                section_file = os.path.join(BASE_DIR, 'outputs/section', os.path.splitext(filename)[0] + '_sections.tsv')
-                tsv_path = os.path.join(BASE_DIR, 'outputs/text', os.path.splitext(filename)[0] + '_text.tsv')
+    section_file = os.path.join(BASE_DIR, 'outputs/section', os.path.splitext(filename)[0] + '_sections.tsv')
+    tsv_path = os.path.join(BASE_DIR, 'outputs/text', os.path.splitext(filename)[0] + '_text.tsv')
 
-                # charger les noms de section si disponible
-                section_names = []
+    # charger les noms de section si disponible
+    section_names = []
 
-                if os.path.exists(section_file):
-                    section_names = read_section_names(section_file)
+    if os.path.exists(section_file):
+        section_names = read_section_names(section_file)
 
-                # parser le pdf basé sur le provider
-                if provider == "VOO":
-                    parse_voo_pdf(pdf_path)
-                elif provider == "Telenet":
-                    pages_to_process = get_pages_to_process(pdf_path, total_pages)  # passer total_pages ici
-                    parse_telenet_pdf(pdf_path, pages_to_process)
-                elif provider == "Orange":
-                    parse_orange_pdf(pdf_path, section_names)  # passer section_names ici
-                else:
-                    print(f"provider non supporté {provider} pour le fichier {filename}")
+    # parser le pdf basé sur le provider
+    if provider == "VOO":
+        parse_voo_pdf(pdf_path)
+    elif provider == "Telenet":
+        pages_to_process = get_pages_to_process(pdf_path, total_pages)  # passer total_pages ici
+        parse_telenet_pdf(pdf_path, pages_to_process)
+    elif provider == "Orange":
+        parse_orange_pdf(pdf_path, section_names)  # passer section_names ici
+    else:
+        print(f"provider non supporté {provider} pour le fichier {filename}")
 
-                # appliquer le marquage tv/radio au fichier tsv
-                add_tv_radio_codes(tsv_path, section_names)
+    # appliquer le marquage tv/radio au fichier tsv
+    add_tv_radio_codes(tsv_path, section_names)
 
+def process_pdfs(directory):
+    """
+    cette fonction traite tous les fichiers pdf dans le répertoire donné.
+    directory c'est le répertoire contenant les fichiers pdf
+    """
+    for filename in os.listdir(directory):
+        if filename.endswith(".pdf"):
+            pdf_path = os.path.join(directory, filename)
+            try:
+                process_pdf(pdf_path)
             except ValueError as e:
                 print(f"erreur en traitant {filename}: {e}")
 
 if __name__ == "__main__":
+    # l'OCR des pages sans texte tourne dans un pool de processus
+    multiprocessing.freeze_support()
     input_directory = os.path.join(BASE_DIR, 'inputs/pdf')
     process_pdfs(input_directory)
@@ -0,0 +1,205 @@
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from enablers.excel import extract_pdf_records, write_consolidated_report
+from parsers.lexicon import lexicon_fingerprint, reload_lexicons
+from utils import consolidate_records, find_latest_channel_grouping_file, check_if_file_open
+
+
+def file_fingerprint(path):
+    """retourne une empreinte legere (taille, date de modification) d'un fichier"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class BrochureWatcher:
+    """
+    surveille le dossier des pdfs et le dossier du groupement des chaînes, et met a jour le rapport consolidé
+    de façon incrementale. le groupement des chaînes, les chaines deja extraites de chaque pdf et l'offre BASE
+    restent en memoire: une nouvelle brochure ne coute que son propre traitement et la fusion finale.
+    """
+
+    def __init__(self, pdf_directory, grouping_directory, output_path, base_offer_loader=None, export_formats=(),
+                 write_xlsx=True):
+        """
+        :param pdf_directory: dossier des brochures pdf a surveiller
+        :param grouping_directory: dossier des fichiers 'Channel_Grouping_Latest_*.xlsx'
+        :param output_path: chemin du rapport excel consolidé
+        :param base_offer_loader: fonction sans argument retournant le DataFrame de l'offre BASE, optionnelle
+        :param export_formats: formats d'export supplementaires du rapport ('csv', 'jsonl', 'parquet')
+        :param write_xlsx: ecrire le rapport excel
+        """
+        self.pdf_directory = Path(pdf_directory)
+        self.grouping_directory = Path(grouping_directory)
+        self.output_path = Path(output_path)
+        self.base_offer_loader = base_offer_loader
+        self.export_formats = export_formats
+        self.write_xlsx = write_xlsx
+
+        self.channel_grouping_df = None
+        self.grouping_file = None
+        self.grouping_fingerprint = None
+        self.base_offer_df = None
+
+        # chaines extraites et empreinte de chaque pdf deja traite
+        self.records = {}
+        self.fingerprints = {}
+        # empreintes vues au dernier passage, pour attendre qu'un fichier en cours de copie soit stable
+        self.pending = {}
+        self.report_outdated = False
+        # empreinte des lexiques des fournisseurs utilises pour extraire les chaines en memoire
+        self.lexicons = lexicon_fingerprint()
+
+    def refresh_grouping(self):
+        """recharge le groupement des chaînes si un fichier plus recent ou modifié est apparu"""
+        try:
+            latest_file = find_latest_channel_grouping_file(self.grouping_directory)
+        except FileNotFoundError as e:
+            if self.channel_grouping_df is None:
+                print(e)
+            return False
+
+        fingerprint = file_fingerprint(latest_file)
+        if latest_file == self.grouping_file and fingerprint == self.grouping_fingerprint:
+            return False
+
+        if check_if_file_open(latest_file):
+            print(f"Veuillez fermer le fichier de groupement des chaînes : {latest_file}")
+            return False
+
+        try:
+            self.channel_grouping_df = pd.read_excel(latest_file, sheet_name='Content_Channel_Grouping')
+        except Exception as e:
+            print(f"Erreur lors du chargement de la feuille Content_Channel_Grouping : {e}")
+            return False
+
+        self.grouping_file = latest_file
+        self.grouping_fingerprint = fingerprint
+        print(f"Fichier de groupement des chaînes chargé : {latest_file}")
+        return True
+
+    def refresh_lexicons(self):
+        """si un lexique des fournisseurs a change, le recharge et re-extrait les pdfs deja traites"""
+        fingerprint = lexicon_fingerprint()
+        if fingerprint == self.lexicons:
+            return False
+
+        print("Lexiques des fournisseurs modifiés, nouvelle extraction des brochures...")
+        reload_lexicons()
+        self.lexicons = fingerprint
+        for name in sorted(self.records):
+            self.pending[name] = self.fingerprints[name]
+            self.ingest(name)
+        return True
+
+    def refresh_base_offer(self):
+        """charge l'offre BASE une seule fois, une erreur réseau n'empêche pas la surveillance"""
+        if self.base_offer_loader is None or self.base_offer_df is not None:
+            return
+        try:
+            self.base_offer_df = self.base_offer_loader()
+        except Exception as e:
+            print(f"Offre BASE indisponible, le rapport sera généré sans elle : {e}")
+            self.base_offer_df = pd.DataFrame()
+
+    def scan_pdfs(self):
+        """
+        compare le contenu du dossier avec l'etat en memoire
+        :return: (liste des pdfs nouveaux ou modifies et stables, liste des pdfs supprimes)
+        """
+        current = {}
+        for pdf_path in self.pdf_directory.glob('*.pdf'):
+            try:
+                current[pdf_path.name] = file_fingerprint(pdf_path)
+            except FileNotFoundError:
+                continue
+
+        changed = []
+        for name, fingerprint in sorted(current.items()):
+            if self.fingerprints.get(name) == fingerprint:
+                continue
+            # un fichier n'est traite que si son empreinte n'a pas bouge depuis le passage precedent
+            if self.pending.get(name) == fingerprint:
+                changed.append(name)
+            else:
+                self.pending[name] = fingerprint
+
+        for name in [name for name in self.pending if name not in current]:
+            del self.pending[name]
+
+        removed = [name for name in self.fingerprints if name not in current]
+        return changed, removed
+
+    def ingest(self, name):
+        """extrait les chaines d'un seul pdf et les garde en memoire"""
+        pdf_path = self.pdf_directory / name
+        print(f"Nouvelle brochure détectée : {name}")
+        try:
+            self.records[name] = extract_pdf_records(pdf_path)
+        except Exception as e:
+            print(f"Erreur en traitant {name}: {e}")
+            self.records.pop(name, None)
+        self.fingerprints[name] = self.pending.pop(name)
+        self.report_outdated = True
+
+    def remove(self, name):
+        """oublie un pdf supprime du dossier"""
+        print(f"Brochure supprimée : {name}")
+        self.records.pop(name, None)
+        self.fingerprints.pop(name, None)
+        self.report_outdated = True
+
+    def rebuild_report(self):
+        """regenere le rapport consolidé a partir des chaines en memoire, sans relire les pdfs"""
+        if self.channel_grouping_df is None:
+            return
+
+        frames = [self.records[name] for name in sorted(self.records) if not self.records[name].empty]
+        if not frames:
+            self.report_outdated = False
+            return
+
+        if self.output_path.exists() and check_if_file_open(self.output_path):
+            print(f"Veuillez fermer le fichier de rapport consolidé : {self.output_path}, nouvel essai au prochain passage.")
+            return
+
+        final_df = consolidate_records(frames, self.channel_grouping_df)
+        if final_df is not None:
+            write_consolidated_report(final_df, self.output_path, self.base_offer_df, self.export_formats,
+                                      self.write_xlsx)
+        self.report_outdated = False
+
+    def poll(self):
+        """un passage de surveillance: groupement, nouvelles brochures, puis rapport si necessaire"""
+        if self.refresh_grouping():
+            self.report_outdated = True
+        self.refresh_lexicons()
+
+        changed, removed = self.scan_pdfs()
+        for name in removed:
+            self.remove(name)
+        for name in changed:
+            self.ingest(name)
+
+        if self.report_outdated:
+            self.rebuild_report()
+
+    def run(self, interval=5.0):
+        """boucle de surveillance jusqu'a interruption (Ctrl+C)"""
+        os.makedirs(self.output_path.parent, exist_ok=True)
+        self.refresh_base_offer()
+
+        # les fichiers presents au demarrage sont consideres comme stables
+        for pdf_path in self.pdf_directory.glob('*.pdf'):
+            self.pending[pdf_path.name] = file_fingerprint(pdf_path)
+
+        print(f"Surveillance de {self.pdf_directory} et {self.grouping_directory} (toutes les {interval} s)...")
+        try:
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Surveillance arrêtée.")
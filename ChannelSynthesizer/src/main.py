@@ -1,42 +1,38 @@
+import argparse
+import multiprocessing
 import os
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd
 from parsers.providers.base import scrape_base_offer
+from parsers.ocr import LOW_MEMORY_ENV
 from utils import create_summary_table, open_file_with_default_app, clean_consolidated_sheet, \
-    check_if_file_open
-from enablers.excel import generate_excel_report
+    check_if_file_open, expand_region_mask, load_channel_grouping, locate_channel_grouping, read_channel_grouping, \
+    build_channel_records, consolidate_records
+from enablers.excel import generate_excel_report, load_all_provider_data, write_consolidated_report
+from enablers.export import export_tables, EXPORT_DIR, EXPORT_FORMATS
 from enablers.sections import process as process_sections
 from enablers.text import process_pdfs
+from enablers.batch import run_archive
+from enablers.watch import BrochureWatcher
+from enablers.store import store_offers
+from enablers.service import ConsolidationService, serve, SERVICE_PORT
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+BASE_OFFER_URL = "https://www.prd.base.be/en/support/tv/your-base-tv-box-and-remote/what-channels-does-base-offer/"
 
 
-def find_latest_channel_grouping_file(input_folder: str) -> Path:
+def prepare_excel_output(output_path: Path):
     """
-    trouve le dernier fichier 'Channel_Grouping_Latest_YYYYMMDD.xlsx' dans le répertoire des inputs.
-    Parcourt tous les fichiers de ce format dans le répertoire fourni
-    et renvoie celui avec la date la plus récente.
-
-    :param input_folder: répertoire où chercher le fichier de groupement des chaînes.
-    :return: Le chemin vers le dernier fichier trouvé.
+    prepare l'ecriture du rapport: cree le dossier de sortie et charge les moteurs excel,
+    pour que leur import ne s'ajoute pas au temps de generation du rapport.
     """
-    input_path = Path(input_folder)
-    grouping_files = list(input_path.glob('Channel_Grouping_Latest_*.xlsx'))
-
-    if not grouping_files:
-        raise FileNotFoundError("Aucun fichier de groupement des chaînes trouvé dans le répertoire des inputs.")
-
-    # trier les fichiers par date pour trouver le dernier fichier
-    latest_file = max(
-        grouping_files,
-        key=lambda file: datetime.strptime(file.stem.split('_')[-1], '%Y%m%d')
-    )
+    os.makedirs(output_path.parent, exist_ok=True)
+    import openpyxl  # noqa: F401
+    import xlsxwriter  # noqa: F401
 
-    return latest_file
 
-
-def main():
+def main(export_formats=(), write_xlsx=True):
     """
     script principale pour traiter les fichiers pdf en quatre étapes:
     1. extraire les sections.
@@ -46,6 +42,9 @@ def main():
 
     Ce script gère l'ensemble du workflow depuis la lecture des fichiers jusqu'à la création d'un rapport consolidé
     au format Excel, en passant par l'extraction des données des PDF.
+
+    :param export_formats: formats d'export supplementaires des tables ('csv', 'jsonl', 'parquet').
+    :param write_xlsx: False pour ne produire que les exports, sans passer par le fichier excel.
     """
 
     # definir les répertoires d'entrée et de sortie
@@ -53,55 +52,64 @@ def main():
     output_directory = os.path.join(BASE_DIR, 'outputs')
     grouping_input_directory = os.path.join(BASE_DIR, 'inputs/')
 
-    print("Recherche du dernier fichier de groupement des chaînes...")
-    try:
-        latest_channel_grouping_file = find_latest_channel_grouping_file(grouping_input_directory)
-        print(f"Fichier de groupement des chaînes trouvé : {latest_channel_grouping_file}")
-    except FileNotFoundError as e:
-        print(e)
-        return
-
-    # verifie si le fichier excel de groupement des chaînes est ouvert
-    if check_if_file_open(latest_channel_grouping_file):
-        print(
-            f"Veuillez fermer le fichier de groupement des chaînes : {latest_channel_grouping_file} avant de continuer.")
-        return
-
     # verifie si le fichier consolidé de sortie est déjà ouvert avant de l'écraser
     output_path = Path(output_directory) / 'xlsx/consolidated_report.xlsx'
     if output_path.exists() and check_if_file_open(output_path):
         print(f"Veuillez fermer le fichier de rapport consolidé : {output_path} avant de continuer.")
         return
 
-    try:
-        # charger les données du fichier de groupement des chaînes
-        channel_grouping_df = pd.read_excel(latest_channel_grouping_file, sheet_name='Content_Channel_Grouping')
-        print("Fichier de groupement des chaînes chargé avec succès.")
-    except Exception as e:
-        print(f"Erreur lors du chargement de la feuille Content_Channel_Grouping : {e}")
+    # le fichier de groupement des chaînes est cherche avant l'extraction: un fichier absent ou ouvert arrete
+    # le script avant les questions interactives sur les pages
+    channel_grouping_file = locate_channel_grouping(grouping_input_directory)
+    if channel_grouping_file is None:
         return
 
-    print("Traitement des sections...")
-    process_sections(input_directory)  # appel du module pour traiter les sections des PDF
-
-    print("Traitement du texte...")
-    process_pdfs(input_directory)  # appel du module pour extraire le texte des PDF
-
-    print("Génération du rapport Excel consolidé...")
-    output_path = generate_excel_report(output_directory, channel_grouping_df)
+    # les etapes d'entree/sortie independantes des pdfs tournent en arriere-plan pendant l'extraction:
+    # lecture du groupement des chaînes, scraping de l'offre BASE et preparation de l'ecriture excel
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        grouping_future = executor.submit(read_channel_grouping, channel_grouping_file)
+        base_offer_future = executor.submit(scrape_base_offer, BASE_OFFER_URL)
+        writer_future = executor.submit(prepare_excel_output, output_path)
+
+        print("Traitement des sections...")
+        process_sections(input_directory)  # appel du module pour traiter les sections des PDF
+
+        print("Traitement du texte...")
+        process_pdfs(input_directory)  # appel du module pour extraire le texte des PDF
+
+        # point de jonction: le rapport a besoin du groupement et du dossier de sortie
+        channel_grouping_df = grouping_future.result()
+        writer_future.result()
+        if channel_grouping_df is None:
+            return
+
+        if not write_xlsx:
+            # sans excel, les tables sont construites et exportees directement en memoire
+            print("Génération des tables consolidées...")
+            frames = [build_channel_records(*entry) for entry in load_all_provider_data()]
+            final_df = consolidate_records(frames, channel_grouping_df) if frames else None
+            if final_df is None:
+                print("Erreur : les tables consolidées n'ont pas été générées.")
+                return
+            write_consolidated_report(final_df, output_path, base_offer_future.result(), export_formats,
+                                      write_xlsx=False, export_directory=EXPORT_DIR)
+            return
+
+        print("Génération du rapport Excel consolidé...")
+        output_path = generate_excel_report(output_directory, channel_grouping_df)
+
+        if output_path:
+            print("Nettoyage de la feuille Consolidated...")
+            clean_consolidated_sheet(output_path)  # supprime les lignes vides ou redondantes du fichier consolidé
+
+        base_offer_df = base_offer_future.result()
 
     if output_path:
-        print("Nettoyage de la feuille Consolidated...")
-        clean_consolidated_sheet(output_path)  # supprime les lignes vides ou redondantes du fichier consolidé
-
-    if output_path:
-        print("Scraping des offres BASE et ajout au rapport...")
-        base_url = "https://www.prd.base.be/en/support/tv/your-base-tv-box-and-remote/what-channels-does-base-offer/"
-        base_offer_df = scrape_base_offer(base_url)
+        print("Ajout des offres BASE au rapport...")
 
         # ajouter les données de l'offre BASE au fichier excel existant
         with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
-            base_offer_df.to_excel(writer, sheet_name='Consolidated', index=False, header=False,
+            expand_region_mask(base_offer_df).to_excel(writer, sheet_name='Consolidated', index=False, header=False,
                                    startrow=writer.sheets['Consolidated'].max_row)
 
         # generation du rapport résumé après ajout des données BASE
@@ -113,10 +121,127 @@ def main():
         with pd.ExcelWriter(output_path, engine='openpyxl', mode='a') as writer:
             summary_df.to_excel(writer, sheet_name='Summary', index=False)
 
+        if export_formats:
+            export_tables(consolidated_df, summary_df, export_formats)
+
+        # garder les offres dans la base sqlite pour les requetes
+        store_offers(consolidated_df)
+
         open_file_with_default_app(output_path)  # ouvre le fichier excel généré par défaut
     else:
         print("Erreur : le rapport Excel consolidé n'a pas été généré.")
 
 
+def main_archive(archive_directory: str, jobs=None, export_formats=(), write_xlsx=True):
+    """
+    mode batch pour un historique de brochures: parcourt toute l'arborescence donnée,
+    traite chaque pdf dans un shard en parallèle puis fusionne les shards dans un rapport unique.
+
+    :param archive_directory: racine de l'arborescence des pdfs (ex: un dossier par année).
+    :param jobs: nombre maximal de processus, par défaut le nombre de coeurs.
+    :param export_formats: formats d'export supplementaires des tables.
+    :param write_xlsx: ecrire le rapport excel.
+    """
+    output_directory = os.path.join(BASE_DIR, 'outputs')
+    grouping_input_directory = os.path.join(BASE_DIR, 'inputs/')
+
+    channel_grouping_df = load_channel_grouping(grouping_input_directory)
+    if channel_grouping_df is None:
+        return
+
+    output_path = Path(output_directory) / 'xlsx/archive_report.xlsx'
+    if output_path.exists() and check_if_file_open(output_path):
+        print(f"Veuillez fermer le fichier de rapport d'archive : {output_path} avant de continuer.")
+        return
+
+    output_path = run_archive(archive_directory, channel_grouping_df, output_path, jobs=jobs,
+                              export_formats=export_formats, write_xlsx=write_xlsx)
+    if output_path and write_xlsx:
+        open_file_with_default_app(output_path)
+    elif output_path:
+        print(f"Tables exportées dans : {output_path}")
+    else:
+        print("Erreur : le rapport d'archive n'a pas été généré.")
+
+
+def main_watch(interval: float = 5.0, export_formats=(), write_xlsx=True):
+    """
+    mode continu: surveille 'inputs/pdf' et 'inputs/' et met à jour le rapport consolidé à chaque nouvelle
+    brochure ou nouveau fichier de groupement, sans recharger ce qui est déjà en mémoire.
+
+    :param interval: délai en secondes entre deux passages.
+    :param export_formats: formats d'export supplementaires des tables.
+    :param write_xlsx: ecrire le rapport excel.
+    """
+    input_directory = os.path.join(BASE_DIR, 'inputs/pdf')
+    grouping_input_directory = os.path.join(BASE_DIR, 'inputs/')
+    output_path = Path(BASE_DIR) / 'outputs/xlsx/consolidated_report.xlsx'
+
+    watcher = BrochureWatcher(input_directory, grouping_input_directory, output_path,
+                              base_offer_loader=lambda: scrape_base_offer(BASE_OFFER_URL),
+                              export_formats=export_formats, write_xlsx=write_xlsx)
+    watcher.run(interval)
+
+
+def main_serve(port: int = SERVICE_PORT, export_formats=(), write_xlsx=True):
+    """
+    mode service: garde le groupement des chaînes, l'offre BASE et les chaines extraites en mémoire
+    et répond aux requêtes http locales (ingestion d'un pdf, régénération du rapport, requêtes d'offres).
+
+    :param port: port d'écoute sur 127.0.0.1.
+    :param export_formats: formats d'export supplementaires des tables.
+    :param write_xlsx: ecrire le rapport excel.
+    """
+    input_directory = os.path.join(BASE_DIR, 'inputs/pdf')
+    grouping_input_directory = os.path.join(BASE_DIR, 'inputs/')
+    output_path = Path(BASE_DIR) / 'outputs/xlsx/consolidated_report.xlsx'
+
+    service = ConsolidationService(input_directory, grouping_input_directory, output_path,
+                                   base_offer_loader=lambda: scrape_base_offer(BASE_OFFER_URL),
+                                   export_formats=export_formats, write_xlsx=write_xlsx)
+    serve(service, port=port)
+
+
+def parse_args():
+    """lit les arguments de la ligne de commande."""
+    parser = argparse.ArgumentParser(description="Consolidation des offres de chaînes des brochures des fournisseurs.")
+    parser.add_argument('--archive', metavar='DIR',
+                        help="traite toute une arborescence de pdfs historiques en mode batch")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="nombre de processus pour le mode batch (défaut : nombre de coeurs)")
+    parser.add_argument('--watch', action='store_true',
+                        help="surveille les dossiers d'entrée et met à jour le rapport à chaque nouvelle brochure")
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help="délai en secondes entre deux passages du mode surveillance (défaut : 5)")
+    parser.add_argument('--serve', action='store_true',
+                        help="lance le service local de consolidation (voir enablers/service.py)")
+    parser.add_argument('--port', type=int, default=SERVICE_PORT,
+                        help=f"port du service local (défaut : {SERVICE_PORT})")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="traite les pdfs une page à la fois pour borner la mémoire (très grosses brochures)")
+    parser.add_argument('--export', nargs='+', choices=EXPORT_FORMATS, default=[], metavar='FORMAT',
+                        help="exporte aussi les tables Consolidated et Summary dans outputs/export "
+                             f"({', '.join(EXPORT_FORMATS)})")
+    parser.add_argument('--no-xlsx', action='store_true',
+                        help="n'écrit pas le fichier excel, uniquement les exports (avec --export)")
+    args = parser.parse_args()
+    if args.no_xlsx and not args.export:
+        parser.error("--no-xlsx nécessite au moins un format --export")
+    return args
+
+
 if __name__ == "__main__":
-    main()  # exécution principale du script
+    # les processus du mode batch et de l'OCR relancent ce script une fois gele en executable (pyinstaller)
+    multiprocessing.freeze_support()
+    args = parse_args()
+    write_xlsx = not args.no_xlsx
+    if args.low_memory:
+        os.environ[LOW_MEMORY_ENV] = '1'  # herite par les processus du mode batch
+    if args.archive:
+        main_archive(args.archive, jobs=args.jobs, export_formats=args.export, write_xlsx=write_xlsx)
+    elif args.watch:
+        main_watch(args.interval, export_formats=args.export, write_xlsx=write_xlsx)
+    elif args.serve:
+        main_serve(args.port, export_formats=args.export, write_xlsx=write_xlsx)
+    else:
+        main(export_formats=args.export, write_xlsx=write_xlsx)  # exécution principale du script
@@ -4,6 +4,8 @@ import os
 import json
 from typing import List, Tuple, Dict, Optional
 
+from parsers.spans import page_spans
+
 PAGE_SELECTION_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../.config/page_selection.json'))
 TELENET_WHITE_COLOR = 16777215
 TELENET_BLACK_COLOR = 1113103  # (hex 11110f)
@@ -23,22 +25,17 @@ def is_parsable_telenet(text: str, color: int, is_bold: bool) -> bool:
 def extract_text_from_page(page, provider: str, colors: List[int]) -> Tuple[List[Tuple], set]:
     extracted_text = []
     sizes = set()
-    blocks = page.get_text("dict")["blocks"]
-
-    for block in blocks:
-        if 'lines' in block:
-            for line in block["lines"]:
-                for span in line["spans"]:
-                    if provider == "Telenet":
-                        is_bold = is_bold_font(span)
-                        sizes.add(span["size"])
-                        extracted_text.append((span["text"], span["color"], span["size"], is_bold, line["bbox"]))
-                    elif provider == "Orange" and span["color"] == TELENET_WHITE_COLOR and (
-                            span["text"][0].isupper() or span["text"].startswith('+')):
-                        extracted_text.append((span["text"], span["color"]))
-                    elif span["color"] in colors:
-                        sizes.add(span["size"])
-                        extracted_text.append((span["text"], span["color"], span["size"]))
+    for span in page_spans(page)["spans"]:
+        if provider == "Telenet":
+            is_bold = is_bold_font(span)
+            sizes.add(span["size"])
+            extracted_text.append((span["text"], span["color"], span["size"], is_bold, tuple(span["line_bbox"])))
+        elif provider == "Orange" and span["color"] == TELENET_WHITE_COLOR and (
+                span["text"][0].isupper() or span["text"].startswith('+')):
+            extracted_text.append((span["text"], span["color"]))
+        elif span["color"] in colors:
+            sizes.add(span["size"])
+            extracted_text.append((span["text"], span["color"], span["size"]))
 
     return extracted_text, sizes
 
@@ -194,7 +191,7 @@ def save_page_selection(page_selection: Dict[str, List[int]]) -> None:
     with open(PAGE_SELECTION_FILE, "w") as file:
         json.dump(page_selection, file)
 
-def get_pages_to_process(pdf_path: str) -> List[int]:
+def get_pages_to_process(pdf_path: str, interactive: bool = True) -> List[int]:
     page_selection = load_page_selection()
     filename = os.path.basename(pdf_path)
     if filename in page_selection:
@@ -207,6 +204,9 @@ def get_pages_to_process(pdf_path: str) -> List[int]:
     if page_count == 1:
         return [1]
 
+    if not interactive:
+        return list(range(1, page_count + 1))
+
     while True:
         pages_input = input(
             f"The document '{filename}' has {page_count} pages. Which pages would you like to process (e.g., 1,3,5 or 1-4)? ")
@@ -0,0 +1,59 @@
+import os
+import re
+import json
+import hashlib
+from functools import lru_cache
+from typing import Dict, FrozenSet, Pattern
+
+# connaissances propres aux fournisseurs (codes, chaines, textes parasites, sections), dans des fichiers json
+# versionnes de parsers/lexicons. chaque lexique est lu et compile une seule fois par processus.
+LEXICON_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'lexicons'))
+
+
+@lru_cache(maxsize=None)
+def load_lexicon(name: str) -> Dict:
+    """lit le fichier parsers/lexicons/<name>.json"""
+    with open(os.path.join(LEXICON_DIR, f"{name}.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def word_set(name: str, key: str) -> FrozenSet[str]:
+    """ensemble des entrees d'un lexique (liste ou cles d'un dictionnaire), pour un test d'appartenance en O(1)"""
+    return frozenset(load_lexicon(name)[key])
+
+
+@lru_cache(maxsize=None)
+def substring_matcher(name: str, key: str) -> Pattern:
+    """
+    regex unique qui trouve n'importe quelle entree du lexique dans une ligne, en un seul parcours
+    remplace les boucles `any(entry in line for entry in entries)`
+    """
+    entries = sorted(load_lexicon(name)[key], key=len, reverse=True)
+    return re.compile('|'.join(re.escape(entry) for entry in entries))
+
+
+@lru_cache(maxsize=None)
+def pattern_matcher(name: str, key: str, ignore_case: bool = True) -> Pattern:
+    """regex unique combinant les motifs (expressions regulieres) d'un lexique"""
+    return re.compile('|'.join(load_lexicon(name)[key]), re.IGNORECASE if ignore_case else 0)
+
+
+def lexicon_fingerprint() -> str:
+    """
+    empreinte du contenu de tous les lexiques, enregistree dans les manifestes des resultats intermediaires
+    (shards, chaines en memoire): quand un lexique change, ces resultats sont recalcules
+    """
+    digest = hashlib.sha1()
+    for filename in sorted(os.listdir(LEXICON_DIR)):
+        if filename.endswith('.json'):
+            digest.update(filename.encode())
+            with open(os.path.join(LEXICON_DIR, filename), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def reload_lexicons() -> None:
+    """oublie les lexiques compiles, pour relire les fichiers modifies dans un processus de longue duree"""
+    for cached in (load_lexicon, word_set, substring_matcher, pattern_matcher):
+        cached.cache_clear()
@@ -0,0 +1,226 @@
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import fitz
+
+from parsers.spans import page_spans, span_text_length
+
+# repli ocr pour les pages sans texte exploitable (brochures scannees ou aplaties en image)
+# pytesseract n'est importe qu'au moment ou une page en a besoin
+OCR_DPI = int(os.environ.get('CHANNELSYNTHESIZER_OCR_DPI', 300))
+OCR_LANG = os.environ.get('CHANNELSYNTHESIZER_OCR_LANG', 'nld+fra')
+OCR_WORKERS = int(os.environ.get('CHANNELSYNTHESIZER_OCR_WORKERS', 0)) or None
+# en dessous de ce nombre de caracteres, une page est consideree comme une image
+MIN_PAGE_TEXT_CHARS = 20
+# mode memoire bornee pour les tres grosses brochures (option --low-memory de main.py)
+LOW_MEMORY_ENV = 'CHANNELSYNTHESIZER_LOW_MEMORY'
+
+OCR_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../outputs/ocr_cache'))
+
+
+def page_hash(document, page, dpi: int) -> str:
+    """
+    empreinte d'une page: flux de contenu, images referencees et resolution de rendu
+    deux pages identiques dans deux fichiers differents partagent donc le meme cache
+    """
+    digest = hashlib.sha1(f"{dpi}:{page.rect}".encode())
+    digest.update(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(document.xref_stream_raw(image[0]) or b'')
+    return digest.hexdigest()
+
+
+def render_page(page, image_path: str, dpi: int) -> None:
+    """rend la page en png dans le cache, via un fichier temporaire pour les ecritures concurrentes"""
+    pixmap = page.get_pixmap(dpi=dpi)
+    temp_path = f"{image_path}.{os.getpid()}.tmp"
+    pixmap.save(temp_path, output='png')
+    os.replace(temp_path, image_path)
+
+
+def ocr_image(image_path: str, lang: str) -> List[str]:
+    """reconnait le texte d'une image et retourne ses lignes non vides"""
+    import pytesseract
+
+    text = pytesseract.image_to_string(image_path, lang=lang)
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def ocr_cached_image(image_path: str, text_path: str, lang: str) -> List[str]:
+    """lance l'ocr d'une image rendue et enregistre le resultat a cote de l'image"""
+    lines = ocr_image(image_path, lang)
+    temp_path = f"{text_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    os.replace(temp_path, text_path)
+    return lines
+
+
+def ocr_pages(document, page_numbers: List[int], dpi: int = OCR_DPI, lang: str = OCR_LANG,
+              max_workers: Optional[int] = OCR_WORKERS) -> Dict[int, List[str]]:
+    """
+    reconnait le texte des pages donnees, en reutilisant le cache des images rendues et des resultats ocr
+    les pages pas encore en cache sont reconnues en parallele dans un pool de processus
+
+    :param document: document fitz ouvert
+    :param page_numbers: numeros des pages (a partir de 1) a reconnaitre
+    :return: dictionnaire numero de page -> lignes reconnues
+    """
+    try:
+        import pytesseract  # noqa: F401
+    except ImportError:
+        print("pytesseract n'est pas installé, les pages sans texte sont ignorées.")
+        return {}
+
+    os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+
+    results = {}
+    todo = []
+    for page_number in page_numbers:
+        page = document.load_page(page_number - 1)
+        key = page_hash(document, page, dpi)
+        image_path = os.path.join(OCR_CACHE_DIR, f"{key}.png")
+        text_path = os.path.join(OCR_CACHE_DIR, f"{key}.txt")
+
+        if os.path.exists(text_path):
+            with open(text_path, 'r', encoding='utf-8') as f:
+                results[page_number] = f.read().splitlines()
+            continue
+
+        if not os.path.exists(image_path):
+            render_page(page, image_path, dpi)
+        todo.append((page_number, image_path, text_path))
+
+    if not todo:
+        return results
+
+    print(f"OCR de {len(todo)} page(s) sans texte à {dpi} dpi...")
+    if len(todo) == 1:
+        page_number, image_path, text_path = todo[0]
+        jobs = {page_number: _safe_ocr(image_path, text_path, lang)}
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {page_number: executor.submit(_safe_ocr, image_path, text_path, lang)
+                       for page_number, image_path, text_path in todo}
+            jobs = {page_number: future.result() for page_number, future in futures.items()}
+
+    results.update(jobs)
+    return results
+
+
+def _safe_ocr(image_path: str, text_path: str, lang: str) -> List[str]:
+    # une page illisible ne doit pas faire echouer tout le document
+    try:
+        return ocr_cached_image(image_path, text_path, lang)
+    except Exception as e:
+        print(f"Erreur OCR pour {image_path}: {e}")
+        return []
+
+
+def low_memory_mode() -> bool:
+    """lu a chaque appel, pour que l'option de main.py s'applique aussi aux processus de travail"""
+    return os.environ.get(LOW_MEMORY_ENV, '0') == '1'
+
+
+def is_image_page(content: Dict) -> bool:
+    """une page sans texte exploitable mais avec des images doit passer par l'ocr"""
+    return span_text_length(content['spans']) < MIN_PAGE_TEXT_CHARS and content['has_images']
+
+
+def span_lines(content: Dict, min_font_size: float) -> List[str]:
+    """texte des spans de la page dont la taille de police est >= min_font_size"""
+    return [span['text'] for span in content['spans'] if span['size'] >= min_font_size]
+
+
+def iter_page_lines(pdf_path: str, page_numbers: Optional[List[int]] = None,
+                    min_font_size: float = 0.0) -> Iterator[str]:
+    """
+    version a memoire bornee de extract_page_lines: une seule page est chargee a la fois,
+    ses lignes sont transmises au consommateur puis la page et le cache de mupdf sont liberes.
+    les pages images sont reconnues une par une dans le processus courant.
+    """
+    document = fitz.open(pdf_path)
+    try:
+        if page_numbers is None:
+            page_numbers = range(1, document.page_count + 1)
+
+        for page_number in page_numbers:
+            page = document.load_page(page_number - 1)
+            content = page_spans(page)
+            del page
+
+            if is_image_page(content):
+                lines = ocr_pages(document, [page_number], max_workers=1).get(page_number, [])
+            else:
+                lines = span_lines(content, min_font_size)
+            del content
+            fitz.TOOLS.store_shrink(100)
+
+            yield from lines
+    finally:
+        document.close()
+
+
+def extract_page_lines(pdf_path: str, page_numbers: Optional[List[int]] = None,
+                       min_font_size: float = 0.0) -> Iterable[str]:
+    """
+    extrait le texte des spans de chaque page (taille de police >= min_font_size)
+    les pages qui ne contiennent presque pas de texte sont reconnues par ocr et leurs lignes
+    sont inserees a la place de la page, pour etre traitees par les memes parseurs
+
+    :param pdf_path: chemin du fichier pdf
+    :param page_numbers: pages a traiter (a partir de 1), toutes par defaut
+    :param min_font_size: taille de police minimale des spans a garder
+    :return: lignes extraites, dans l'ordre des pages (un generateur page par page en mode memoire bornee)
+    """
+    if low_memory_mode():
+        return iter_page_lines(pdf_path, page_numbers, min_font_size)
+
+    document = fitz.open(pdf_path)
+    try:
+        if page_numbers is None:
+            page_numbers = list(range(1, document.page_count + 1))
+
+        page_lines = {}
+        image_pages = []
+        for page_number in page_numbers:
+            page = document.load_page(page_number - 1)
+            # spans reutilises depuis le cache si la meme page a deja ete decodee, meme dans un autre fichier
+            content = page_spans(page)
+
+            if is_image_page(content):
+                image_pages.append(page_number)
+                continue
+
+            page_lines[page_number] = span_lines(content, min_font_size)
+
+        if image_pages:
+            page_lines.update(ocr_pages(document, image_pages))
+    finally:
+        document.close()
+
+    return [line for page_number in page_numbers for line in page_lines.get(page_number, [])]
+
+
+def text_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    memes lignes que "\n".join(lines).splitlines(), sans construire le texte complet: les parseurs des
+    fournisseurs consomment ainsi les lignes de extract_page_lines au fil de l'eau.
+    seule la derniere ligne incomplete est gardee en attente (un span peut contenir un saut de ligne)
+    """
+    pending = None
+    for line in lines:
+        pending = line if pending is None else pending + "\n" + line
+        pieces = pending.splitlines(keepends=True)
+        # la derniere piece attend la suite si elle n'est pas terminee, ou si son '\r' peut former '\r\n'
+        last = pieces[-1] if pieces else ""
+        if not pieces or last.splitlines()[0] == last or last.endswith("\r"):
+            pending = pieces.pop() if pieces else ""
+        else:
+            pending = ""
+        for piece in pieces:
+            yield piece.splitlines()[0]
+    if pending:
+        yield from pending.splitlines()
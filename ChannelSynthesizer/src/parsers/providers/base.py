@@ -3,29 +3,63 @@ import requests
 import pandas as pd
 
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-
-
-def scrape_base_offer(base_url):
+from requests.adapters import HTTPAdapter
+
+from utils import REGION_FLANDERS, REGION_BRUSSELS, REGION_WALLONIA
+
+# numérotation au début du nom de la chaîne (ex: "12. VTM")
+CHANNEL_NUMBER_PATTERN = re.compile(r'^\d+\.\s*')
+# suffixes retirés pour créer le niveau de groupe de chaînes (HD, SD, FR, NL, variantes régionales)
+CHANNEL_GROUP_PATTERN = re.compile(
+    r'\b(HD|SD|FR|NL|Vlaams Brabant|Antwerpen|Limburg|Oost-Vlaanderen|West-Vlaanderen|60\'s & 70\'s|80\'s & 90\'s)\b'
+)
+# nombre maximal de pages téléchargées en même temps
+MAX_FETCH_WORKERS = 8
+
+BASE_COLUMNS = [
+    'Channel',
+    'Provider_Period',
+    # masque des régions, déplié en colonnes à l'export
+    'Regions',
+    'Basic/Option',
+    'TV/Radio',
+    # la colonne HD/SD est ajoutee ici
+    'HD/SD',
+    # Channel Group Level est positionné correctement en tant que dernière colonne
+    'Channel Group Level'
+]
+
+
+def fetch_pages(urls, max_workers=MAX_FETCH_WORKERS):
     """
-    cette fonction scrape les offres de chaines du site BASE pour extraire les données
-    elle prend en parametre l'URL de la page à scraper
-    elle retourne un DataFrame contenant les informations extraites
-
-    cette fonction va d'abord faire une requête à l'URL fournie, puis elle va parser la page HTML obtenue
-    ensuite, elle va chercher les éléments des chaînes de TV ou de radio dans la page, selon les sections definies
-    pour chaque chaîne trouve, les données seront ajoutees a  une liste qui sera ensuite transformée en DataFrame
+    télécharge les pages en parallèle avec une session partagée (connexions réutilisées)
+    :param urls: liste des URLs
+    :return: contenu de chaque page, dans l'ordre des URLs
     """
-    response = requests.get(base_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
 
-    channel_data = []
-    accordion_items = soup.select('.cmp-accordion__item')
+        if len(urls) == 1:
+            return [session.get(urls[0]).content]
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+            return list(executor.map(lambda url: session.get(url).content, urls))
 
-    # obtenir l'année actuelle pour la période du fournisseur
-    scrape_year = datetime.now().year
 
-    for accordion_item in accordion_items:
+def parse_base_page(content):
+    """
+    collecte les éléments de chaînes d'une page BASE, sans les normaliser
+    :param content: contenu html de la page
+    :return: liste de tuples (texte brut de la chaîne, masque des régions, TV/Radio)
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    items = []
+
+    for accordion_item in soup.select('.cmp-accordion__item'):
         region_name_element = accordion_item.select_one('.cmp-accordion__header h5, .cmp-accordion__header .heading--5')
         if not region_name_element:
             print("Warning: No region name found for an accordion item, skipping.")
@@ -35,61 +69,70 @@ def scrape_base_offer(base_url):
 
         # déterminer les codes des régions
         if 'dutch' in region_name:
-            regions = [1, 1, 0, 0]   # flandre et bruxelles
+            regions = REGION_FLANDERS | REGION_BRUSSELS   # flandre et bruxelles
         elif 'french' in region_name:
-            regions = [0, 1, 1, 0]  # Wallonie et bruxelles
+            regions = REGION_WALLONIA | REGION_BRUSSELS  # Wallonie et bruxelles
         else:
             # ignorer si le nom de la région n'est pas reconnu
             continue
 
         # déterminer si la section est TV ou Radio
-        if 'radio' in region_name:
-            tv_radio = 'Radio'
-        else:
-            tv_radio = 'TV'
-
-        # scraper les chaînes
-        channel_list_items = accordion_item.select('.cmp-text p')
-        for item in channel_list_items:
-            channel = item.get_text().strip()
-
-            # enlever la numérotation au début du nom de la chaîne
-            channel = re.sub(r'^\d+\.\s*', '', channel)
-            # ajouter uniquement les lignes avec des noms de chaînes non vides
-            if channel:
-                # créer le niveau de groupe de chaînes en supprimant HD, SD, FR, et NL
-                channel_group_level = re.sub(r'\b(HD|SD|FR|NL|Vlaams Brabant|Antwerpen|Limburg|Oost-Vlaanderen|West-Vlaanderen|60\'s & 70\'s|80\'s & 90\'s)\b', '', channel).strip()
-
-                # ajouter les données de la chaîne
-                channel_data.append([
-                    channel,
-                    f'BASE {scrape_year}',
-                    *regions,
-                    'Basic',
-                    tv_radio,
-                    # HD/SD sera déterminé plus tard, donc on laisse vide
-                    '',
-                    channel_group_level
-                ])
-
-    # créer un DataFrame
-    df = pd.DataFrame(
-        channel_data,
-        columns=[
-            'Channel',
-            'Provider_Period',
-            'Region Flanders',
-            'Brussels',
-            'Region Wallonia',
-            'Communauté Germanophone',
-            'Basic/Option',
-            'TV/Radio',
-            # la colonne HD/SD est ajoutee ici
-            'HD/SD',
-            # Channel Group Level est positionné correctement en tant que dernière colonne
-            'Channel Group Level'
-        ]
-    )
+        tv_radio = 'Radio' if 'radio' in region_name else 'TV'
+
+        items.extend((item.get_text(), regions, tv_radio) for item in accordion_item.select('.cmp-text p'))
+
+    return items
+
+
+def normalize_base_channels(items, scrape_year):
+    """
+    normalise tous les éléments collectés en une seule passe vectorisée
+    :param items: tuples (texte brut, masque des régions, TV/Radio) retournés par parse_base_page
+    :param scrape_year: année de la période du fournisseur
+    :return: DataFrame au format des enregistrements consolidés
+    """
+    raw = pd.DataFrame(items, columns=['Raw', 'Regions', 'TV/Radio'])
+
+    # enlever la numérotation au début du nom de la chaîne
+    channels = raw['Raw'].str.strip().str.replace(CHANNEL_NUMBER_PATTERN, '', regex=True)
+    # garder uniquement les lignes avec des noms de chaînes non vides
+    keep = channels != ''
+    channels = channels[keep]
+
+    df = pd.DataFrame({
+        'Channel': channels,
+        'Provider_Period': f'BASE {scrape_year}',
+        'Regions': raw.loc[keep, 'Regions'],
+        'Basic/Option': 'Basic',
+        'TV/Radio': raw.loc[keep, 'TV/Radio'],
+        # HD/SD sera déterminé plus tard, donc on laisse vide
+        'HD/SD': '',
+        # créer le niveau de groupe de chaînes en supprimant HD, SD, FR, NL et les variantes régionales
+        'Channel Group Level': channels.str.replace(CHANNEL_GROUP_PATTERN, '', regex=True).str.strip(),
+    }, columns=BASE_COLUMNS)
+
+    return df.reset_index(drop=True)
+
+
+def scrape_base_offer(base_url):
+    """
+    cette fonction scrape les offres de chaines du site BASE pour extraire les données
+    elle prend en parametre l'URL de la page à scraper, ou une liste d'URLs (TV, radio, variantes régionales)
+    elle retourne un DataFrame contenant les informations extraites
+
+    les pages sont téléchargées en parallèle, puis les éléments des chaînes de TV ou de radio de toutes les pages
+    sont collectés et normalisés en une seule fois
+    """
+    urls = [base_url] if isinstance(base_url, str) else list(base_url)
+
+    # obtenir l'année actuelle pour la période du fournisseur
+    scrape_year = datetime.now().year
+
+    items = []
+    for content in fetch_pages(urls):
+        items.extend(parse_base_page(content))
+
+    df = normalize_base_channels(items, scrape_year)
 
     # supprimé les lignes avec des valeurs 'Channel' vide
     df = df.dropna(subset=['Channel'])
@@ -1,36 +1,24 @@
 import os
 import re
-import fitz
+
+from parsers.ocr import extract_page_lines, text_lines
 
 def extract_text(pdf_path, min_font_size=8.0):
     """
     extrait le texte d'un fichier pdf en utilisant un taille de police minimal
     parcourt les pages et récupère les spans de texte qui sont plus grand que la taille spécifié
-    retourne tout le texte extrait sous forme de chaîne de caractères
+    les pages sans texte (images) passent par l'ocr
+    retourne les lignes extraites au fil des pages, sans construire le texte complet
     """
-    document = fitz.open(pdf_path)
-    text = []
-
-    for i in range(document.page_count):
-        page = document.load_page(i)
-        blocks = page.get_text("dict")["blocks"]
-
-        for block in blocks:
-            if 'lines' in block:
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        if span['size'] >= min_font_size:
-                            text.append(span['text'])
+    return text_lines(extract_page_lines(pdf_path, min_font_size=min_font_size))
 
-    return "\n".join(text)
-
-def clean_text(text):
+def clean_text(lines):
     """
-    nettoie le texte extrait en supprimant les lignes inutiles ou trop longues
+    nettoie les lignes extraites en supprimant les lignes inutiles ou trop longues
     ignore les lignes qui sont vide ou contiennent des mots spécifiques
+    genere les lignes gardees une par une
     """
-    cleaned_lines = []
-    for line in text.splitlines():
+    for line in lines:
         line = line.strip()
         if not line:
             continue
@@ -42,8 +30,7 @@ def clean_text(text):
             continue
         if "je regionale kanaal" in line.lower():  # exclut les lignes qui contiennent "Je regionale kanaal"
             continue
-        cleaned_lines.append(line)
-    return "\n".join(cleaned_lines)
+        yield line
 
 def determine_region_from_filename(filename):
     """
@@ -74,41 +61,24 @@ def is_channel_line(line, section_names):
         return False
     return True
 
-def append_region_code_to_text(text, region_code, section_names):
+def append_region_code_to_text(lines, region_code, section_names):
     """
     ajoute le code de region à la fin de chaque ligne qui represente une chaîne
-    remplit les codes de region manquants en se basant sur les lignes adjacentes
+    chaque ligne de chaîne sans code recoit region_code, il ne reste donc aucun code manquant a completer
+    depuis les lignes precedentes. genere les lignes une par une
     """
-    if region_code:
-        lines = text.splitlines()
-        processed_lines = []
-        for line in lines:
-            if is_channel_line(line, section_names):
-                if not re.search(r'\b(F|B|W|G)\b$', line):  # si aucun code de région n'est présent
-                    processed_lines.append(f"{line} {region_code}")
-                else:
-                    processed_lines.append(line)
-            else:
-                processed_lines.append(line)
-
-        # traitement postérieur pour remplir les codes de région manquants
-        for i, line in enumerate(processed_lines):
-            if is_channel_line(line, section_names) and not re.search(r'\b(F|B|W|G)\b$', line):
-                # trouve le dernier code de région valide
-                for j in range(i - 1, -1, -1):
-                    match = re.search(r'\b(F|B|W|G)\b$', processed_lines[j])
-                    if match:
-                        processed_lines[i] = f"{line} {match.group(0)}"
-                        break
-
-        return "\n".join(processed_lines)
-    return text
-
-def save_as_tsv(text, filename: str) -> None:
+    for line in lines:
+        if region_code and is_channel_line(line, section_names) and not re.search(r'\b(F|B|W|G)\b$', line):
+            # si aucun code de région n'est présent
+            yield f"{line} {region_code}"
+        else:
+            yield line
+
+def save_as_tsv(lines, filename: str) -> None:
     """
-    sauvegarde le texte nettoyé dans un fichier tsv
+    sauvegarde les lignes nettoyées dans un fichier tsv
     créer le répertoire de sortie s'il n'existe pas
-    écrit chaque ligne du texte dans le fichier tsv
+    écrit chaque ligne dans le fichier tsv des qu'elle est produite
     """
     output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../outputs/text/'))
     if not os.path.exists(output_dir):
@@ -120,7 +90,7 @@ def save_as_tsv(text, filename: str) -> None:
     output_path = os.path.join(output_dir, new_filename)
 
     with open(output_path, 'w', encoding='utf-8') as f:
-        for line in text.splitlines():
+        for line in lines:
             f.write(line + '\n')
 
     print(f"Saved TSV to {output_path}")
@@ -132,10 +102,11 @@ def parse_orange_pdf(pdf_path, section_names, min_font_size=8.0):
     sauvegarde le resultat dans un fichier tsv
     """
     print(f"extraction du texte de {pdf_path} avec une taille de police minimum de {min_font_size}")
-    text = extract_text(pdf_path, min_font_size)
-    cleaned_text = clean_text(text)
+    # les lignes passent d'une etape a l'autre sans que le texte complet soit construit
+    lines = extract_text(pdf_path, min_font_size)
+    cleaned_lines = clean_text(lines)
 
     region_code = determine_region_from_filename(os.path.basename(pdf_path))
-    text_with_region_code = append_region_code_to_text(cleaned_text, region_code, section_names)
+    lines_with_region_code = append_region_code_to_text(cleaned_lines, region_code, section_names)
 
-    save_as_tsv(text_with_region_code, pdf_path)
+    save_as_tsv(lines_with_region_code, pdf_path)
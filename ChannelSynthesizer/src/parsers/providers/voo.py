@@ -1,27 +1,13 @@
 import os
-import fitz
+
+from parsers.ocr import extract_page_lines, text_lines
+from parsers.lexicon import word_set
 
 # from ChannelSynthesizer.src.utils import add_tv_radio_codes
 
-VOO_info_codes = {
-    "VS": "VOOsport",
-    "w VS": "VOOsport World",
-    "Pa": "Bouquet Panorama",
-    "Ci": "Option Ciné Pass",
-    "Doc": "Be Bouquet Documentaires",
-    "Div": "Be Bouquet Divertissement",
-    "Co": "Be Cool",
-    "Enf": "Be Bouquet Enfant",
-    "Sp": "Be Bouquet Sport",
-    "Sel": "Be Bouquet Selection",
-    "Inf": "Option Infos",
-    "Sen": "Option Sensation",
-    "Ch": "Option Charme",
-    "FF": "Family Fun",
-    "DM": "Discover More",
-    "CX": "Classé X",
-    "MX": "Man-X",
-}
+def voo_info_codes():
+    """codes d'info VOO (bouquets et options), lus depuis parsers/lexicons/voo.json"""
+    return word_set('voo', 'info_codes')
 
 # lire les noms des sections à partir d'un fichier
 def read_section_names(file_path):
@@ -50,6 +36,7 @@ def modify_row(row, section_names):
     """
     modifie la ligne pour garder les codes d'info VOO et les regions. si rien de valides n'est trouvé, retourne la ligne originale.
     """
+    info_codes = voo_info_codes()
     words = row.split()
     filtered_words = []
     last_valid_index = -1
@@ -58,7 +45,7 @@ def modify_row(row, section_names):
         if word in ['G', 'W', 'B', 'F']:
             last_valid_index = i
             filtered_words.append(word)
-        elif word in VOO_info_codes:
+        elif word in info_codes:
             filtered_words.append(word)  # garder les codes info VOO dans la ligne
         else:
             filtered_words.append(word)
@@ -73,6 +60,7 @@ def combine_lines_with_info_codes(lines):
     """
     combine les lignes qui contiennent des codes info VOO avec la ligne précédente. utile pour réduire les lignes séparées inutilement
     """
+    info_codes = voo_info_codes()
     combined_lines = []
     skip_next = False
 
@@ -82,7 +70,7 @@ def combine_lines_with_info_codes(lines):
             continue
 
         stripped_line = line.strip()
-        if stripped_line in VOO_info_codes:
+        if stripped_line in info_codes:
             # si cette ligne est un code info et qu'il y a une ligne suivante, on les combine
             if i < len(lines) - 1:
                 combined_lines[-1] = combined_lines[-1].strip() + ' ' + stripped_line
@@ -96,27 +84,16 @@ def combine_lines_with_info_codes(lines):
 # extraire le texte du fichier PDF
 def extract_text(pdf_path):
     """
-    extrait le texte du fichier PDF spécifié. renvoie le texte extrait sous forme de chaîne de caractères
+    extrait le texte du fichier PDF spécifié. les pages sans texte (images) passent par l'ocr.
+    renvoie les lignes extraites au fil des pages, sans construire le texte complet
     """
-    document = fitz.open(pdf_path)
-    text = []
-
-    for i in range(document.page_count):
-        page = document.load_page(i)
-        blocks = page.get_text("dict")["blocks"]
-
-        for block in blocks:
-            if 'lines' in block:
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        text.append(span["text"])
-
-    return "\n".join(text)
+    return text_lines(extract_page_lines(pdf_path))
 
 # sauvegarder le texte extrait sous forme de TSV
-def save_as_tsv(text, filename: str) -> None:
+def save_as_tsv(lines, filename: str) -> None:
     """
-    sauvegarde le texte extrait sous forme de fichier TSV. cree le repertoire de sortie si nécessaire.
+    sauvegarde les lignes extraites sous forme de fichier TSV, chacune des qu'elle est produite.
+    cree le repertoire de sortie si nécessaire.
     """
     output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../outputs/text/'))
     if not os.path.exists(output_dir):
@@ -128,7 +105,7 @@ def save_as_tsv(text, filename: str) -> None:
     output_path = os.path.join(output_dir, new_filename)
 
     with open(output_path, 'w', encoding='utf-8') as f:
-        for line in text.splitlines():
+        for line in lines:
             f.write(line + '\n')
 
 # nettoyer le fichier TSV
@@ -296,13 +273,14 @@ def split_long_line(line):
     """
     divise une ligne trop longue en plusieurs lignes en fonction de mots spécifiques. utile pour garder les lignes courtes et pertinentes
     """
+    info_codes = voo_info_codes()
     words = line.split()
     new_lines = []
     current_line = []
 
     for i, word in enumerate(words):
         current_line.append(word)
-        if word in ['G', 'W', 'B', 'F'] or word in VOO_info_codes:
+        if word in ['G', 'W', 'B', 'F'] or word in info_codes:
             new_lines.append(" ".join(current_line) + "\n")
             current_line = []
 
@@ -376,11 +354,12 @@ def remove_voo_info_code_only_or_long_rows(tsv_path):
     with open(tsv_path, 'r', encoding='utf-8') as f:
         lines = f.readlines()
 
+    info_codes = voo_info_codes()
     cleaned_lines = []
     for line in lines:
         stripped_line = line.strip()
         # vérifie si la ligne contient uniquement un code info VOO ou dépasse 35 caractères
-        if stripped_line not in VOO_info_codes and len(stripped_line) <= 35:
+        if stripped_line not in info_codes and len(stripped_line) <= 35:
             cleaned_lines.append(line)
 
     with open(tsv_path, 'w', encoding='utf-8') as f:
@@ -393,8 +372,8 @@ def parse_voo_pdf(pdf_path):
     """
     parse le fichier PDF VOO pour extraire le texte, nettoyer et traiter le contenu, et sauvegarder les résultats sous forme de fichier TSV.
     """
-    text = extract_text(pdf_path)
-    save_as_tsv(text, pdf_path)
+    lines = extract_text(pdf_path)
+    save_as_tsv(lines, pdf_path)
     tsv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../outputs/text/', os.path.splitext(os.path.basename(pdf_path))[0] + '_text.tsv'))
     clean_tsv(tsv_path)
     print(f"Sauvegardé et nettoyé {tsv_path}")
@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import hashlib
+from typing import Dict, List
+
+import fitz
+
+# cache des spans de texte par page, partage entre les fichiers: une brochure reeditee avec une seule page
+# modifiee (sous un autre nom de fichier) ne redecode que cette page
+SPAN_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../outputs/span_cache'))
+SPAN_CACHE_ENABLED = os.environ.get('CHANNELSYNTHESIZER_SPAN_CACHE', '1') != '0'
+# a incrementer quand le contenu des spans mis en cache change
+SPAN_CACHE_VERSION = 1
+# taille maximale du cache: au-dela, les pages lues le moins recemment sont supprimees
+SPAN_CACHE_MAX_BYTES = int(os.environ.get('CHANNELSYNTHESIZER_SPAN_CACHE_MB', 256)) * 1024 * 1024
+# les blocs image ne sont pas utilises: sans ce drapeau, get_text("dict") copie chaque image en memoire
+SPAN_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+_span_cache_pruned = False
+
+
+def object_refs(document, kind: str, value: str) -> List[int]:
+    """xrefs references par une valeur de xref_get_key, y compris dans un tableau indirect ('[12 0 R]')"""
+    if kind == 'xref':
+        xref = int(value.split()[0])
+        target = document.xref_object(xref, compressed=True)
+        if not target.startswith('['):
+            return [xref]
+        value = target
+    elif kind != 'array':
+        return []
+    return [int(ref) for ref in re.findall(r'(\d+) 0 R', value)]
+
+
+def font_streams(document, font_xref: int) -> List[bytes]:
+    """
+    ce qui decide du texte decode avec une police: table ToUnicode, dictionnaire d'encodage (Differences)
+    et programme de la police, aussi pour les polices descendantes des polices composites (Type0)
+    """
+    streams = []
+    for xref in object_refs(document, *document.xref_get_key(font_xref, 'ToUnicode')):
+        streams.append(document.xref_stream_raw(xref) or b'')
+    for xref in object_refs(document, *document.xref_get_key(font_xref, 'Encoding')):
+        streams.append(document.xref_object(xref, compressed=True).encode())
+
+    fonts = [font_xref] + object_refs(document, *document.xref_get_key(font_xref, 'DescendantFonts'))
+    for xref in fonts:
+        for key in ('FontFile', 'FontFile2', 'FontFile3'):
+            for stream_xref in object_refs(document, *document.xref_get_key(xref, f'FontDescriptor/{key}')):
+                streams.append(document.xref_stream_raw(stream_xref) or b'')
+    return streams
+
+
+def page_fingerprint(page) -> str:
+    """
+    empreinte d'une page calculee sans decoder le texte: flux de contenu, formulaires (xobjects),
+    polices (description, ToUnicode, encodage et programme) et description des images referencees.
+    les numeros d'objets (xref) sont ignores car ils changent d'un fichier a l'autre pour une meme page.
+    """
+    document = page.parent
+    digest = hashlib.sha1(f"{SPAN_CACHE_VERSION}:{page.rect}:{page.rotation}".encode())
+    digest.update(page.read_contents())
+    for xobject in page.get_xobjects():
+        digest.update(document.xref_stream_raw(xobject[0]) or b'')
+    for font in page.get_fonts(full=True):
+        digest.update(repr(font[1:6]).encode())
+        for stream in font_streams(document, font[0]):
+            digest.update(stream)
+    for image in page.get_images(full=True):
+        # (xref, smask, width, height, bpc, colorspace, alt. colorspace, name, filter, referencer):
+        # ni le xref de l'image, ni celui de son masque, ni celui de l'objet qui la reference
+        digest.update(repr(image[2:-1]).encode())
+    return digest.hexdigest()
+
+
+def decode_page_spans(page) -> Dict:
+    """decode le texte de la page et garde, pour chaque span, ce dont les parseurs ont besoin"""
+    spans = [
+        {
+            'text': span['text'],
+            'size': span['size'],
+            'color': span['color'],
+            'font': span['font'],
+            'line_bbox': list(line['bbox']),
+        }
+        for block in page.get_text("dict", flags=SPAN_TEXT_FLAGS)["blocks"] if 'lines' in block
+        for line in block["lines"]
+        for span in line["spans"]
+    ]
+    return {'spans': spans, 'has_images': bool(page.get_images())}
+
+
+def prune_span_cache(max_bytes: int = SPAN_CACHE_MAX_BYTES) -> None:
+    """
+    supprime les pages du cache lues le moins recemment (date de modification, mise a jour a chaque lecture)
+    jusqu'a ce que le cache tienne dans max_bytes
+    """
+    entries = []
+    with os.scandir(SPAN_CACHE_DIR) as scan:
+        for entry in scan:
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # deja supprime par un autre processus du mode batch
+        total -= size
+
+
+def page_spans(page) -> Dict:
+    """
+    retourne les spans d'une page, depuis le cache si une page identique a deja ete decodee
+
+    :param page: page fitz chargee
+    :return: dictionnaire {'spans': liste des spans, 'has_images': la page contient des images}
+    """
+    global _span_cache_pruned
+    if not SPAN_CACHE_ENABLED:
+        return decode_page_spans(page)
+
+    os.makedirs(SPAN_CACHE_DIR, exist_ok=True)
+    if not _span_cache_pruned:
+        # une fois par processus: le cache depasse au plus la limite des pages ajoutees pendant ce traitement
+        _span_cache_pruned = True
+        prune_span_cache()
+
+    cache_path = os.path.join(SPAN_CACHE_DIR, f"{page_fingerprint(page)}.json")
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(cache_path)  # page lue recemment: gardee en priorite
+            return result
+        except (json.JSONDecodeError, OSError):
+            pass  # fichier abime ou supprime entre-temps: la page est decodee a nouveau
+
+    result = decode_page_spans(page)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(temp_path, cache_path)
+    return result
+
+
+def span_text_length(spans: List[Dict]) -> int:
+    """compte les caracteres non blancs de tous les spans d'une page"""
+    return sum(len(span['text'].strip()) for span in spans)
@@ -1,12 +1,43 @@
 import os
 import re
 import subprocess
+import sys
+from datetime import datetime
 
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from parsers.lexicon import word_set, pattern_matcher
+
 BASE_DIR = Path(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
+# les regions sont codees en interne dans un seul masque de bits (colonne 'Regions')
+# les quatre colonnes larges ne sont produites qu'au moment de l'export
+REGION_FLANDERS = 1
+REGION_BRUSSELS = 2
+REGION_WALLONIA = 4
+REGION_GERMANOPHONE = 8
+REGION_ALL = REGION_FLANDERS | REGION_BRUSSELS | REGION_WALLONIA | REGION_GERMANOPHONE
+
+# colonnes exportees, dans le meme ordre que les bits du masque
+REGION_COLUMNS = ['Region Flanders', 'Brussels', 'Region Wallonia', 'Communauté Germanophone']
+REGION_BITS = [REGION_FLANDERS, REGION_BRUSSELS, REGION_WALLONIA, REGION_GERMANOPHONE]
+
+# colonnes des enregistrements de chaines produits pour chaque fichier pdf
+RECORD_COLUMNS = ['Channel', 'Provider_Period', 'Regions', 'Basic/Option', 'TV/Radio', 'HD/SD']
+
+# types compacts du DataFrame consolide: les colonnes a peu de valeurs distinctes sont categorielles
+# les categories fixes se conservent lors des concat entre fichiers
+COMPACT_DTYPES = {
+    'Provider_Period': 'category',
+    'Basic/Option': pd.CategoricalDtype(['Basic', 'Option']),
+    'TV/Radio': pd.CategoricalDtype(['TV', 'Radio']),
+    'HD/SD': pd.CategoricalDtype(['', 'HD', 'SD']),
+    'Channel Group Level': 'category',
+    'Regions': np.uint8,
+}
+
 
 def get_provider_and_year(filename):
     """
@@ -64,15 +95,80 @@ def parse_tsv(tsv_path, section_names, provider):
     return data
 
 
+def apply_compact_schema(df):
+    """
+    applique les types compacts au DataFrame des chaines: categories pour les colonnes repetitives,
+    noms de chaines internes (une seule copie de chaque nom) et masque des régions sur un octet
+    :param df: DataFrame des chaines
+    :return: le DataFrame avec les types compacts
+    """
+    dtypes = {col: dtype for col, dtype in COMPACT_DTYPES.items() if col in df.columns}
+    df = df.astype(dtypes)
+    if 'Channel' in df.columns:
+        df['Channel'] = df['Channel'].map(lambda channel: sys.intern(channel) if isinstance(channel, str) else channel)
+    return df
+
+
 def ensure_region_columns_exist(df):
-    """verifier que toutes les colonnes des régions existent dans le DataFrame."""
-    region_columns = ['Region Flanders', 'Brussels', 'Region Wallonia', 'Communauté Germanophone']
-    for col in region_columns:
-        if col not in df.columns:
-            df[col] = 0  # Initialiser la colonne avec des zéros
+    """
+    verifier que le masque des régions existe dans le DataFrame
+    si les quatre colonnes larges sont présentes (ex: rapport relu depuis excel), elles sont repliées dans le masque
+    """
+    if 'Regions' in df.columns:
+        return df
+
+    mask = np.zeros(len(df), dtype=np.uint8)
+    for col, bit in zip(REGION_COLUMNS, REGION_BITS):
+        if col in df.columns:
+            mask |= np.where(df[col].fillna(0).astype(int) > 0, bit, 0).astype(np.uint8)
+
+    position = df.columns.get_loc(REGION_COLUMNS[0]) if REGION_COLUMNS[0] in df.columns else len(df.columns)
+    df = df.drop(columns=[col for col in REGION_COLUMNS if col in df.columns])
+    df.insert(min(position, len(df.columns)), 'Regions', mask)
     return df
 
 
+def expand_region_mask(df):
+    """
+    remplace la colonne masque 'Regions' par les quatre colonnes de région (0/1) attendues dans l'export excel
+    :param df: DataFrame contenant la colonne 'Regions'
+    :return: DataFrame avec les colonnes larges à la place du masque
+    """
+    if 'Regions' not in df.columns:
+        return df
+
+    mask = df['Regions'].to_numpy()
+    position = df.columns.get_loc('Regions')
+    df = df.drop(columns=['Regions'])
+    for offset, (col, bit) in enumerate(zip(REGION_COLUMNS, REGION_BITS)):
+        df.insert(position + offset, col, ((mask & bit) > 0).astype(np.int8))
+    return df
+
+
+def merge_region_duplicates(df, keys):
+    """
+    fusionne les lignes en double sur les clés données en combinant leurs masques de région par un OU binaire
+    les autres colonnes gardent la valeur de la première occurrence, comme drop_duplicates
+    :param df: DataFrame contenant la colonne 'Regions'
+    :param keys: colonnes identifiant une chaîne (ex: ['Channel', 'Provider_Period'])
+    :return: DataFrame avec une ligne par clé
+    """
+    if df.empty:
+        return df
+
+    # les groupes sont numérotés dans l'ordre de première apparition, le tri stable garde cet ordre
+    codes = df.groupby(keys, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+    merged = np.bitwise_or.reduceat(df['Regions'].to_numpy()[order], starts)
+
+    result = df.iloc[order[starts]].copy()
+    result['Regions'] = merged.astype(np.uint8)
+    return result
+
+
 def find_file_pairs(section_dir, text_dir):
     """
     Trouver les paires de fichiers de section et texte basé sur leurs noms de fichier
@@ -81,13 +177,17 @@ def find_file_pairs(section_dir, text_dir):
     :return: liste de tuples, chaque tuple contient une paire de (section_file, text_file)
     """
     section_files = list(Path(section_dir).glob('*_sections.tsv'))
-    text_files = list(Path(text_dir).glob('*.tsv'))
+
+    # index des fichiers texte par nom de base, pour une recherche directe au lieu d'une comparaison par paire
+    text_files = {
+        text_file.stem[:-len('_text')]: text_file
+        for text_file in Path(text_dir).glob('*_text.tsv')
+    }
 
     file_pairs = []
     for section_file in section_files:
-        base_name = section_file.stem.replace('_sections', '')
-        text_file = next(
-            (text_file for text_file in text_files if base_name in text_file.stem and '_text' in text_file.stem), None)
+        base_name = section_file.stem[:-len('_sections')]
+        text_file = text_files.get(base_name)
         if text_file:
             file_pairs.append((section_file, text_file))
 
@@ -101,21 +201,22 @@ def post_process_orange_regions(final_df):
     :return: Le DataFrame avec les codes de région Orange post-traités
     """
     # Filtrer seulement les lignes Orange
-    orange_df = final_df[final_df['Provider_Period'].str.contains("Orange")]
-
-    # Boucler à travers les lignes Orange pour appliquer la cohérence des régions
-    for index, row in orange_df.iterrows():
-        # Trouver quelle colonne de région a la valeur '1'
-        regions = row[['Region Flanders', 'Brussels', 'Region Wallonia', 'Communauté Germanophone']]
-        if regions.sum() > 1:  # Si plus d'une région est marqué comme disponible
-            # Déterminer la bonne région en vérifiant les autres lignes avec le même nom de chaîne
-            matching_rows = orange_df[orange_df['Channel'] == row['Channel']]
-            correct_region = matching_rows[
-                ['Region Flanders', 'Brussels', 'Region Wallonia', 'Communauté Germanophone']].sum(axis=0).idxmax()
-
-            # Mettre seulement la région correcte à 1, et les autres à 0
-            final_df.loc[index, ['Region Flanders', 'Brussels', 'Region Wallonia', 'Communauté Germanophone']] = 0
-            final_df.loc[index, correct_region] = 1
+    orange_mask = final_df['Provider_Period'].str.contains("Orange")
+    orange_df = final_df[orange_mask]
+    if orange_df.empty:
+        return final_df
+
+    # une colonne booléenne par bit de région
+    masks = orange_df['Regions'].to_numpy()
+    flags = pd.DataFrame((masks[:, None] & np.array(REGION_BITS)) > 0, index=orange_df.index).astype(int)
+
+    # Déterminer la bonne région en comptant les régions des autres lignes avec le même nom de chaîne
+    counts = flags.groupby(orange_df['Channel']).transform('sum').to_numpy()
+    correct_region = np.array(REGION_BITS, dtype=np.uint8)[counts.argmax(axis=1)]
+
+    # Si plus d'une région est marqué comme disponible, garder seulement la région correcte
+    multiple = (flags.sum(axis=1) > 1).to_numpy()
+    final_df.loc[orange_df.index[multiple], 'Regions'] = correct_region[multiple]
 
     return final_df
 
@@ -126,20 +227,8 @@ def is_basic_section(section_name):
     :param section_name: Le nom de la section à vérifier
     :return: True si la section est considérée comme basique, sinon False
     """
-    basic_sections = [
-        r'BASISAANBOD',
-        r'RADIOZENDERS',
-        r'STINGRAY MUSIC',
-        r'OFFRE DE BASE',
-        r'CHAÎNES DE RADIO',
-        r'CHAÎNES DE MUSIQUE',
-        r'BASISAANBOD / OFFRE DE BASE',
-        r'RADIOZENDERS / CHAÎNES DE RADIO',
-        r'MUZIEKZENDERS/CHAÎNES DE MUSIQUE'
-    ]
-
-    # Compiler regex pour être insensible à la casse
-    basic_sections_regex = re.compile('|'.join(basic_sections), re.IGNORECASE)
+    # motifs lus depuis parsers/lexicons/sections.json, compilés une seule fois (insensibles à la casse)
+    basic_sections_regex = pattern_matcher('sections', 'basic_section_patterns')
 
     return bool(basic_sections_regex.search(section_name))
 
@@ -176,14 +265,16 @@ def create_summary_table(final_df):
     summary_df = unique_channels.pivot_table(index='Provider_Period',
                                              columns='Basic/Option',
                                              aggfunc='size',
-                                             fill_value=0).reset_index()
+                                             fill_value=0,
+                                             observed=True).reset_index()
 
     # Ajouter le total général
     summary_df['Grand Total'] = summary_df['Basic'] + summary_df['Option']
 
     # Renommer les colonnes
-    summary_df.columns.name = None  # Retirer le nom de la colonne croisée
+    summary_df.columns = list(summary_df.columns)  # Retirer le nom et le type catégoriel des colonnes croisées
     summary_df = summary_df.rename(columns={'Provider_Period': 'Row Labels'})
+    summary_df['Row Labels'] = summary_df['Row Labels'].astype(str)
     overall_totals = {
         'Row Labels': 'Grand Total',
         'Basic': summary_df['Basic'].sum(),
@@ -196,136 +287,120 @@ def create_summary_table(final_df):
     return summary_df
 
 
-def create_consolidated_excel(all_data, output_path, channel_grouping_df):
+def build_channel_records(provider, year, data, section_names, filename):
     """
-    cree un rapport excel consolide a partir des donnees analysees
-    :param all_data: liste de tuples contenant le fournisseur, l'annee, les donnees et les noms de section
-    :param output_path: chemin vers le fichier excel a enregistrer
-    :param channel_grouping_df: dataframe contenant les correspondances de noms de chaines et de groupes
+    transforme les lignes analysees d'un seul fichier pdf en enregistrements de chaines
+    c'est l'etape "map" de la consolidation, chaque fichier peut etre traite independamment
+    :param provider: le nom du fournisseur
+    :param year: l'annee du fichier
+    :param data: liste de [section, chaine] retournee par parse_tsv
+    :param section_names: liste des noms de sections
+    :param filename: le nom du fichier texte (utilise pour les regions telenet)
+    :return: DataFrame avec une ligne par chaine
     """
-    combined_data = []
-
-    #dictionnaire des codes d'info voo pour mapper les noms des bouquets
-    voo_info_codes = {
-        "VS": "voosport",
-        "w VS": "voosport world",
-        "Pa": "bouquet panorama",
-        "Ci": "option cine pass",
-        "Doc": "be bouquet documentaires",
-        "Div": "be bouquet divertissement",
-        "Co": "be cool",
-        "Enf": "be bouquet enfant",
-        "Sp": "be bouquet sport",
-        "Sel": "be bouquet selection",
-        "Inf": "option infos",
-        "Sen": "option sensation",
-        "Ch": "option charme",
-        "FF": "family fun",
-        "DM": "discover more",
-        "CX": "classe x",
-        "MX": "man-x",
-    }
-
-    #regex pour identifier les mots cles des options orange
-    orange_option_keywords = re.compile(
-        r'Be |be series|be seri|be cin|cine\+|cine\+|eleven pro|voosport world',
-        re.IGNORECASE
-    )
-
-    for provider, year, data, section_names, filename in all_data:
-        print(f"processing provider: {provider}, year: {year}")
-        print(f"data length: {len(data)}")
-        period = f"{provider} {year}"
-        static_columns = ['Region Flanders', 'Brussels', 'Region Wallonia', 'Communauté Germanophone']
-        df_data = []
-
-        for entry in data:
-            section = entry[0]
-            channel = entry[1]
-            print(f"processing channel: {channel}")
-
-            #initialiser les regions comme non disponibles
-            regions = [0, 0, 0, 0]  #flanders, brussels, wallonia, germanophone
-
-            #determiner les regions en fonction des codes de region dans le nom de la chaine
-            if provider in ["Orange", "Voo"]:
-                if 'W' in channel.split():
-                    regions = [0, 0, 1, 0]  #seulement wallonie
-                elif 'B' in channel.split():
-                    regions = [0, 1, 0, 0]  #seulement bruxelles
-                elif 'G' in channel.split():
-                    regions = [0, 0, 0, 1]  #seulement germanophone
-                elif 'F' in channel.split():
-                    regions = [1, 0, 0, 0]  #seulement flandre
-                else:
-                    regions = [1, 1, 1, 1]  #par defaut toutes les regions
-
-                #supprimer le code de region du nom de la chaine
-                channel = re.sub(r'\b(W|B|G|F| w)\b', '', channel).strip()
-
-            elif provider == "Telenet":
-                if 'Flanders' in filename or 'Vlaanderen' in filename:
-                    regions = [1, 0, 0, 0]
-                elif 'Brussels' in filename or 'Bruxelles' in filename or 'Brussel' in filename:
-                    regions = [0, 1, 0, 0]
-                elif 'Wallonia' in filename or 'Wallonie' in filename or 'Wallonië' in filename:
-                    regions = [0, 0, 1, 0]
-                elif 'Germanophone' in filename or 'German-speaking' in filename or 'German' in filename:
-                    regions = [0, 0, 0, 1]
-                else:
-                    regions = [1, 1, 0, 0]
-
-            #determiner si la section est basic ou option pour voo
-            if provider == "Voo":
-                if section == 'Chaînes Be tv':
-                    option = 'Option'
-                elif any(code in channel.split() for code in voo_info_codes.keys()):
-                    option = 'Option'
-                else:
-                    option = 'Basic'
-                #supprimer les codes d'info voo du nom de la chaine
-                channel = ' '.join([word for word in channel.split() if word not in voo_info_codes.keys()])
-            elif provider == "Orange":
-                #pour orange, par defaut basic sauf si le nom de la chaine correspond a un mot-cle d'option
-                if orange_option_keywords.search(channel):
-                    option = 'Option'
-                else:
-                    option = 'Basic'
+    print(f"processing provider: {provider}, year: {year}")
+    print(f"data length: {len(data)}")
+    period = f"{provider} {year}"
+    df_data = []
+    #codes d'info voo et mots-cles des options orange, lus depuis parsers/lexicons
+    voo_info_codes = word_set('voo', 'info_codes')
+    orange_option_keywords = pattern_matcher('orange', 'option_patterns')
+
+    for entry in data:
+        section = entry[0]
+        channel = entry[1]
+        print(f"processing channel: {channel}")
+
+        #initialiser les regions comme non disponibles
+        regions = 0
+
+        #determiner les regions en fonction des codes de region dans le nom de la chaine
+        if provider in ["Orange", "Voo"]:
+            if 'W' in channel.split():
+                regions = REGION_WALLONIA  #seulement wallonie
+            elif 'B' in channel.split():
+                regions = REGION_BRUSSELS  #seulement bruxelles
+            elif 'G' in channel.split():
+                regions = REGION_GERMANOPHONE  #seulement germanophone
+            elif 'F' in channel.split():
+                regions = REGION_FLANDERS  #seulement flandre
             else:
-                #pour d'autres fournisseurs, utiliser le nom de la section pour determiner basic ou option
-                if is_basic_section(section):
-                    option = 'Basic'
-                else:
-                    option = 'Option'
-
-            #determiner si la chaine est tv ou radio en fonction du nom de la chaine
-            if channel.endswith('TV'):
-                tv_radio = 'TV'
-                channel = channel[:-2].strip()  #supprimer le suffixe 'tv' du nom de la chaine
-            elif channel.endswith('R'):
-                tv_radio = 'Radio'
-                channel = channel[:-1].strip()  #supprimer le suffixe 'r' du nom de la chaine
+                regions = REGION_ALL  #par defaut toutes les regions
+
+            #supprimer le code de region du nom de la chaine
+            channel = re.sub(r'\b(W|B|G|F| w)\b', '', channel).strip()
+
+        elif provider == "Telenet":
+            if 'Flanders' in filename or 'Vlaanderen' in filename:
+                regions = REGION_FLANDERS
+            elif 'Brussels' in filename or 'Bruxelles' in filename or 'Brussel' in filename:
+                regions = REGION_BRUSSELS
+            elif 'Wallonia' in filename or 'Wallonie' in filename or 'Wallonië' in filename:
+                regions = REGION_WALLONIA
+            elif 'Germanophone' in filename or 'German-speaking' in filename or 'German' in filename:
+                regions = REGION_GERMANOPHONE
             else:
-                tv_radio = 'TV'
-
-            #determiner si la chaine est hd, sd, ou ni l'un ni l'autre
-            if 'HD' in channel:
-                hd_sd = 'HD'
-            elif 'SD' in channel:
-                hd_sd = 'SD'
+                regions = REGION_FLANDERS | REGION_BRUSSELS
+
+        #determiner si la section est basic ou option pour voo
+        if provider == "Voo":
+            if section == 'Chaînes Be tv':
+                option = 'Option'
+            elif any(code in voo_info_codes for code in channel.split()):
+                option = 'Option'
             else:
-                hd_sd = ''
-
-            #ajouter les donnees traitees pour cette chaine
-            df_data.append([channel, period] + regions + [option, tv_radio, hd_sd])
-
-        #creer un dataframe a partir des donnees traitees
-        df = pd.DataFrame(df_data,
-                          columns=['Channel', 'Provider_Period'] + static_columns + ['Basic/Option', 'TV/Radio', 'HD/SD'])
-        combined_data.append(df)
-
+                option = 'Basic'
+            #supprimer les codes d'info voo du nom de la chaine
+            channel = ' '.join([word for word in channel.split() if word not in voo_info_codes])
+        elif provider == "Orange":
+            #pour orange, par defaut basic sauf si le nom de la chaine correspond a un mot-cle d'option
+            if orange_option_keywords.search(channel):
+                option = 'Option'
+            else:
+                option = 'Basic'
+        else:
+            #pour d'autres fournisseurs, utiliser le nom de la section pour determiner basic ou option
+            if is_basic_section(section):
+                option = 'Basic'
+            else:
+                option = 'Option'
+
+        #determiner si la chaine est tv ou radio en fonction du nom de la chaine
+        if channel.endswith('TV'):
+            tv_radio = 'TV'
+            channel = channel[:-2].strip()  #supprimer le suffixe 'tv' du nom de la chaine
+        elif channel.endswith('R'):
+            tv_radio = 'Radio'
+            channel = channel[:-1].strip()  #supprimer le suffixe 'r' du nom de la chaine
+        else:
+            tv_radio = 'TV'
+
+        #determiner si la chaine est hd, sd, ou ni l'un ni l'autre
+        if 'HD' in channel:
+            hd_sd = 'HD'
+        elif 'SD' in channel:
+            hd_sd = 'SD'
+        else:
+            hd_sd = ''
+
+        #ajouter les donnees traitees pour cette chaine
+        df_data.append([channel, period, regions, option, tv_radio, hd_sd])
+
+    #creer un dataframe a partir des donnees traitees
+    df = pd.DataFrame(df_data, columns=RECORD_COLUMNS)
+    return apply_compact_schema(df)
+
+
+def consolidate_records(frames, channel_grouping_df):
+    """
+    combine les enregistrements de chaines de plusieurs fichiers et applique les regles de consolidation
+    c'est l'etape "reduce": coherence des regions orange, fusion des doublons et groupement des chaines
+    :param frames: liste de DataFrames produits par build_channel_records
+    :param channel_grouping_df: dataframe contenant les correspondances de noms de chaines et de groupes
+    :return: le DataFrame consolide, ou None si les colonnes de groupement sont absentes
+    """
     #combiner tous les dataframes en un seul dataframe final
-    final_df = pd.concat(combined_data, ignore_index=True)
+    final_df = apply_compact_schema(pd.concat(frames, ignore_index=True))
 
     #appliquer un post-traitement pour la coherence des regions orange
     final_df = post_process_orange_regions(final_df)
@@ -333,8 +408,8 @@ def create_consolidated_excel(all_data, output_path, channel_grouping_df):
     #supprimer les lignes ou la valeur de channel est simplement 'w'
     final_df = final_df[final_df['Channel'] != 'w']
 
-    #supprimer les lignes en double avec le meme 'channel' et 'provider_period'
-    final_df = final_df.drop_duplicates(subset=['Channel', 'Provider_Period'])
+    #fusionner les lignes en double avec le meme 'channel' et 'provider_period' (ou binaire des regions)
+    final_df = merge_region_duplicates(final_df, ['Channel', 'Provider_Period'])
 
     #verifier si les colonnes necessaires existent dans le dataframe de groupement
     if 'CHANNEL_NAME' in channel_grouping_df.columns and 'CHANNEL_NAME_GROUP' in channel_grouping_df.columns:
@@ -358,13 +433,30 @@ def create_consolidated_excel(all_data, output_path, channel_grouping_df):
 
         final_df = final_df[final_df['Channel'].str.strip() != '']
 
-        #ecrire le dataframe final dans un fichier excel
-        with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-            final_df.to_excel(writer, sheet_name='Consolidated', index=False)
+        return apply_compact_schema(final_df)
+
+    print("les colonnes 'CHANNEL_NAME' et 'CHANNEL_NAME_GROUP' sont absentes du dataframe de groupement.")
+    return None
 
-        print(f"rapport excel consolide cree a : {output_path}")
-    else:
-        print("les colonnes 'CHANNEL_NAME' et 'CHANNEL_NAME_GROUP' sont absentes du dataframe de groupement.")
+
+def create_consolidated_excel(all_data, output_path, channel_grouping_df):
+    """
+    cree un rapport excel consolide a partir des donnees analysees
+    :param all_data: liste de tuples contenant le fournisseur, l'annee, les donnees et les noms de section
+    :param output_path: chemin vers le fichier excel a enregistrer
+    :param channel_grouping_df: dataframe contenant les correspondances de noms de chaines et de groupes
+    """
+    frames = [build_channel_records(*entry) for entry in all_data]
+
+    final_df = consolidate_records(frames, channel_grouping_df)
+    if final_df is None:
+        return
+
+    #ecrire le dataframe final dans un fichier excel, les regions sont depliees en colonnes a l'export
+    with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
+        expand_region_mask(final_df).to_excel(writer, sheet_name='Consolidated', index=False)
+
+    print(f"rapport excel consolide cree a : {output_path}")
 
 def open_file_with_default_app(file_path: str):
     """
@@ -383,15 +475,12 @@ def open_file_with_default_app(file_path: str):
         print(f"Erreur lors de l'ouverture du fichier : {e}")
 
 
-def clean_consolidated_sheet(output_path: str):
+def filter_invalid_channels(consolidated_df):
     """
-    nettoyer la feuille consolidated en supprimant les lignes ou la valeur 'channel' correspond aux motifs specifies
-    utilise une regex pour filtrer les chaines non valides dans le fichier excel consolide
-    :param output_path: le chemin du fichier excel consolide a nettoyer
+    supprime les lignes ou la valeur 'channel' correspond aux motifs de chaines non valides
+    :param consolidated_df: le DataFrame consolide
+    :return: le DataFrame sans les lignes non valides
     """
-    #charger la feuille 'consolidated' du fichier excel
-    consolidated_df = pd.read_excel(output_path, sheet_name='Consolidated')
-
     #definir les motifs de suppression avec une regex
     pattern = (
         r"^[•/+-]"  #commence par •, /, -, +
@@ -403,7 +492,19 @@ def clean_consolidated_sheet(output_path: str):
     )
 
     #filtrer les lignes qui ne correspondent pas au motif
-    cleaned_df = consolidated_df[~consolidated_df['Channel'].str.match(pattern, na=False)]
+    return consolidated_df[~consolidated_df['Channel'].str.match(pattern, na=False)]
+
+
+def clean_consolidated_sheet(output_path: str):
+    """
+    nettoyer la feuille consolidated en supprimant les lignes ou la valeur 'channel' correspond aux motifs specifies
+    utilise une regex pour filtrer les chaines non valides dans le fichier excel consolide
+    :param output_path: le chemin du fichier excel consolide a nettoyer
+    """
+    #charger la feuille 'consolidated' du fichier excel
+    consolidated_df = pd.read_excel(output_path, sheet_name='Consolidated')
+
+    cleaned_df = filter_invalid_channels(consolidated_df)
 
     #ecrire le dataframe nettoye dans le fichier excel
     with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
@@ -425,3 +526,82 @@ def check_if_file_open(file_path):
     except PermissionError:
         return True
     return False
+
+
+def find_latest_channel_grouping_file(input_folder: str) -> Path:
+    """
+    trouve le dernier fichier 'Channel_Grouping_Latest_YYYYMMDD.xlsx' dans le répertoire des inputs.
+    Parcourt tous les fichiers de ce format dans le répertoire fourni
+    et renvoie celui avec la date la plus récente.
+
+    :param input_folder: répertoire où chercher le fichier de groupement des chaînes.
+    :return: Le chemin vers le dernier fichier trouvé.
+    """
+    input_path = Path(input_folder)
+    grouping_files = list(input_path.glob('Channel_Grouping_Latest_*.xlsx'))
+
+    if not grouping_files:
+        raise FileNotFoundError("Aucun fichier de groupement des chaînes trouvé dans le répertoire des inputs.")
+
+    # trier les fichiers par date pour trouver le dernier fichier
+    latest_file = max(
+        grouping_files,
+        key=lambda file: datetime.strptime(file.stem.split('_')[-1], '%Y%m%d')
+    )
+
+    return latest_file
+
+
+def locate_channel_grouping(grouping_input_directory: str):
+    """
+    cherche le dernier fichier de groupement des chaînes et verifie qu'il n'est pas ouvert, sans le lire.
+
+    :param grouping_input_directory: répertoire où chercher le fichier de groupement des chaînes.
+    :return: le chemin du fichier, ou None s'il est absent ou ouvert.
+    """
+    print("Recherche du dernier fichier de groupement des chaînes...")
+    try:
+        latest_channel_grouping_file = find_latest_channel_grouping_file(grouping_input_directory)
+        print(f"Fichier de groupement des chaînes trouvé : {latest_channel_grouping_file}")
+    except FileNotFoundError as e:
+        print(e)
+        return None
+
+    # verifie si le fichier excel de groupement des chaînes est ouvert
+    if check_if_file_open(latest_channel_grouping_file):
+        print(
+            f"Veuillez fermer le fichier de groupement des chaînes : {latest_channel_grouping_file} avant de continuer.")
+        return None
+
+    return latest_channel_grouping_file
+
+
+def read_channel_grouping(channel_grouping_file):
+    """
+    lit la feuille 'Content_Channel_Grouping' d'un fichier de groupement des chaînes.
+
+    :param channel_grouping_file: chemin rendu par locate_channel_grouping.
+    :return: le DataFrame de groupement, ou None si la feuille est illisible.
+    """
+    try:
+        # charger les données du fichier de groupement des chaînes
+        channel_grouping_df = pd.read_excel(channel_grouping_file, sheet_name='Content_Channel_Grouping')
+        print("Fichier de groupement des chaînes chargé avec succès.")
+    except Exception as e:
+        print(f"Erreur lors du chargement de la feuille Content_Channel_Grouping : {e}")
+        return None
+
+    return channel_grouping_df
+
+
+def load_channel_grouping(grouping_input_directory: str):
+    """
+    charge la feuille 'Content_Channel_Grouping' du dernier fichier de groupement des chaînes.
+
+    :param grouping_input_directory: répertoire où chercher le fichier de groupement des chaînes.
+    :return: le DataFrame de groupement, ou None si le fichier est absent, ouvert ou illisible.
+    """
+    channel_grouping_file = locate_channel_grouping(grouping_input_directory)
+    if channel_grouping_file is None:
+        return None
+    return read_channel_grouping(channel_grouping_file)
@@ -0,0 +1,97 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+# read by output_paths when it is first imported, and inherited by the parsing workers
+OUTPUT_DIR_ENV = 'EXCELAGGREGATOR_OUTPUT_DIR'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Parse contract workbooks and centralize them without the GUI. "
+                    "Progress is written to stdout as JSON Lines, logs go to stderr.")
+    parser.add_argument('--contracts', nargs='+', required=True, metavar='PATH',
+                        help="contract .xlsx files or directories containing them")
+    parser.add_argument('--jobs', type=int, default=None, help="number of parsing processes (default: CPU count)")
+    parser.add_argument('--out', default=None, metavar='DIR',
+                        help="output directory (tsv, records, xlsx); defaults to src/outputs")
+    parser.add_argument('--force', action='store_true', help="parse every contract again, even unchanged ones")
+    parser.add_argument('--no-centralize', action='store_true', help="only parse, do not write centralized_data.xlsx")
+    parser.add_argument('--channel-packs', nargs='+', default=[], choices=['csv', 'parquet'], metavar='FORMAT',
+                        help="also write the contract x channel x pack table as csv and/or parquet (needs pyarrow)")
+    parser.add_argument('--log-level', default='WARNING', help="level of the logs written to stderr")
+    return parser.parse_args(argv)
+
+
+def emit(event, **fields):
+    line = {"event": event, "time": datetime.now(timezone.utc).isoformat(timespec='seconds')}
+    line.update(fields)
+    sys.stdout.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.out:
+        # before importing anything that derives its paths from output_paths
+        os.environ[OUTPUT_DIR_ENV] = os.path.abspath(args.out)
+
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    import contract_batch
+    import contract_exporter
+    from output_paths import OUTPUT_ROOT
+
+    started = time.perf_counter()
+    xlsx_files = contract_batch.list_contracts(args.contracts)
+    missing = [path for path in xlsx_files if not os.path.isfile(path)]
+    if missing:
+        for path in missing:
+            emit("contract", file=path, status="error", error="file not found", seconds=None)
+        return 1
+
+    emit("start", contracts=len(xlsx_files), jobs=args.jobs or os.cpu_count(), output=OUTPUT_ROOT)
+
+    def on_progress(xlsx_path, result):
+        emit("contract", file=os.path.basename(xlsx_path), status="error" if result["error"] else "ok",
+             seconds=result["seconds"], error=result["error"], tsv=result["tsv"])
+
+    try:
+        results = contract_batch.parse_changed_contracts(xlsx_files, args.jobs, on_progress, args.force)
+    except SystemExit:
+        emit("done", status="error", error="no pack reference or channels.tsv file found")
+        return 1
+
+    failed = contract_batch.failed_contracts(results)
+    parse_seconds = time.perf_counter() - started
+    emit("parsed", contracts=len(xlsx_files), changed=len(results), failed=len(failed),
+         seconds=round(parse_seconds, 3),
+         contracts_per_second=round(len(results) / parse_seconds, 2) if results else None)
+
+    status = "error" if failed else "ok"
+    if not failed and not args.no_centralize:
+        centralize_started = time.perf_counter()
+        try:
+            contract_count = contract_exporter.main(args.channel_packs)
+            emit("centralized", output=contract_exporter.OUTPUT_FILE, contracts=contract_count,
+                 seconds=round(time.perf_counter() - centralize_started, 3))
+        except Exception as e:
+            logging.exception("Centralization failed")
+            emit("centralized", status="error", error=f"{type(e).__name__}: {e}")
+            status = "error"
+
+    emit("done", status=status, failed=[os.path.basename(path) for path in failed],
+         seconds=round(time.perf_counter() - started, 3))
+    return 0 if status == "ok" else 1
+
+
+if __name__ == "__main__":
+    # parsing processes of a frozen build start this exe again
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # fuzzy matching falls back to difflib: slower, with close but not identical scores
+    fuzz = process = None
+
+# fuzzy matches below this score (0-100) are not trusted
+FUZZY_SCORE_CUTOFF = 90
+# fuzzy candidates are only looked up among names starting with the same characters
+PREFIX_LENGTH = 1
+# numbers and language/definition suffixes tell apart names that are otherwise nearly identical
+# ("Eurosport 1" / "Eurosport 2", "Discovery Channel HD FR" / "... HD NL"), so they must match exactly
+DISTINCT_TOKEN_PATTERN = re.compile(r"\b(\d+|hd|sd|fr|nl)\b")
+
+
+def normalize_name(name):
+    return " ".join(re.sub(r"[^\w&+!]+", " ", str(name).casefold()).split())
+
+
+def fuzzy_scores(key, candidates):
+    if process is not None:
+        return [(candidate, score) for candidate, score, _ in
+                process.extract(key, candidates, scorer=fuzz.ratio, score_cutoff=FUZZY_SCORE_CUTOFF, limit=5)]
+    scores = ((candidate, SequenceMatcher(None, key, candidate).ratio() * 100) for candidate in candidates)
+    return sorted((item for item in scores if item[1] >= FUZZY_SCORE_CUTOFF), key=lambda item: -item[1])[:5]
+
+
+class ReferenceIndex:
+    def __init__(self, names):
+        self.names = {}
+        self.blocks = defaultdict(list)
+        for name in names:
+            if not isinstance(name, str):
+                continue
+            key = normalize_name(name)
+            if key and key not in self.names:
+                self.names[key] = name.strip()
+                self.blocks[key[:PREFIX_LENGTH]].append(key)
+
+    def match(self, text, fuzzy=True):
+        key = normalize_name(text)
+        if not key:
+            return None
+        if key in self.names:
+            return self.names[key], 100.0
+        if not fuzzy:
+            return None
+
+        distinct_tokens = DISTINCT_TOKEN_PATTERN.findall(key)
+        for candidate, score in fuzzy_scores(key, self.blocks.get(key[:PREFIX_LENGTH], [])):
+            if DISTINCT_TOKEN_PATTERN.findall(candidate) == distinct_tokens:
+                return self.names[candidate], round(score, 1)
+        return None
+
+
+class ChannelRecognizer:
+    def __init__(self, pack_names, channel_names):
+        self.packs = ReferenceIndex(pack_names)
+        self.channels = ReferenceIndex(channel_names)
+
+    def match_line(self, line):
+        # ("pack" | "channel", canonical name, score) for exact matches, then the best fuzzy match
+        for fuzzy in (False, True):
+            pack = self.packs.match(line, fuzzy)
+            channel = self.channels.match(line, fuzzy)
+            if pack and (not channel or pack[1] >= channel[1]):
+                return "pack", pack[0], pack[1]
+            if channel:
+                return "channel", channel[0], channel[1]
+            if not fuzzy and "&" in line:
+                # combined packs ("Pickx All Stars & Sports") are only split when not known as a whole
+                return None
+        return None
+
+    def match_packs(self, line):
+        pack = self.packs.match(line)
+        if pack:
+            return [pack]
+        return [pack for pack in (self.packs.match(part) for part in line.split("&")) if pack]
+
+    def recognize(self, lines):
+        # [{"channel", "packs", "score", "pack_scores"}] in order of the first pack found for each channel
+        channels = {}
+        current_channel = None
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            match = self.match_line(line)
+            if match and match[0] == "channel":
+                current_channel = match[1:]
+                continue
+
+            packs = [match[1:]] if match else self.match_packs(line) if "&" in line else []
+            if current_channel and packs:
+                name, score = current_channel
+                channel = channels.setdefault(name, {"channel": name, "score": score, "pack_scores": {}})
+                channel["score"] = min(channel["score"], score)
+                for pack, pack_score in packs:
+                    channel["pack_scores"][pack] = max(pack_score, channel["pack_scores"].get(pack, 0))
+
+        for channel in channels.values():
+            channel["pack_scores"] = dict(sorted(channel["pack_scores"].items()))
+            channel["packs"] = list(channel["pack_scores"])
+        return [{key: channel[key] for key in ("channel", "packs", "score", "pack_scores")}
+                for channel in channels.values()]
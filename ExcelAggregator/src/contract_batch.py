@@ -0,0 +1,145 @@
+import glob
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import contract_exporter
+from channel_recognizer import ChannelRecognizer
+from contract_parser import (ensure_output_dir, load_channel_reference, load_existing_packs, parse_contract_workbook,
+                             save_to_tsv)
+from contract_manifest import changed_contracts, load_manifest, mark_parsed, mark_templates_learned, save_manifest
+from contract_record import save_record
+from contract_template import save_learned_template
+
+# set once per worker process by init_worker, so each contract does not re-read the pack reference
+_worker_recognizer = None
+# how often a running batch checks whether it was cancelled, in seconds
+CANCEL_CHECK_INTERVAL = 0.2
+
+
+def init_worker(recognizer):
+    global _worker_recognizer
+    _worker_recognizer = recognizer
+
+
+def parse_contract(xlsx_path):
+    # {"tsv": written .tsv or None, "error": message or None, "seconds": parsing time in the worker,
+    #  "templates": templates learned from this contract, written by the parent process}
+    start = time.perf_counter()
+    tsv_path = error = None
+    templates = []
+    try:
+        text_content, record = parse_contract_workbook(xlsx_path, recognizer=_worker_recognizer,
+                                                       on_template=templates.append)
+        if text_content:
+            save_record(record, xlsx_path)
+            tsv_path = save_to_tsv(text_content, xlsx_path)
+        else:
+            error = "no content could be extracted"
+            logging.error(f"Failed to extract text from {xlsx_path}")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        logging.error(f"Error while parsing {xlsx_path}: {error}")
+    return {"tsv": tsv_path, "error": error, "seconds": round(time.perf_counter() - start, 3), "templates": templates}
+
+
+def list_contracts(paths):
+    xlsx_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            xlsx_files.extend(sorted(glob.glob(os.path.join(path, "*.xlsx"))))
+        else:
+            xlsx_files.append(path)
+    return xlsx_files
+
+
+def parse_contracts(xlsx_files, max_workers=None, on_progress=None, cancel_event=None):
+    # cancel_event (threading.Event): once set, contracts not started yet are skipped and left out of the results
+    if not xlsx_files:
+        return {}
+
+    recognizer = ChannelRecognizer(load_existing_packs(), load_channel_reference())
+    ensure_output_dir()
+
+    results = {}
+
+    def record_result(future):
+        xlsx_path = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            # the worker itself failed (killed, result not picklable...)
+            logging.error(f"Error while parsing {xlsx_path}: {e}")
+            result = {"tsv": None, "error": f"{type(e).__name__}: {e}", "seconds": None, "templates": []}
+        for template in result.pop("templates"):
+            save_learned_template(template)
+        results[xlsx_path] = result
+        if on_progress:
+            on_progress(xlsx_path, result)
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                             initargs=(recognizer,)) as executor:
+        futures = {executor.submit(parse_contract, xlsx_path): xlsx_path for xlsx_path in xlsx_files}
+        pending = set(futures)
+        cancelled = False
+        while pending:
+            if not cancelled and cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                for future in pending:
+                    future.cancel()
+                pending = {future for future in pending if not future.cancelled()}
+                logging.info(f"Parsing cancelled, waiting for {len(pending)} running contract(s)")
+            done, pending = wait(pending, timeout=CANCEL_CHECK_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                record_result(future)
+
+    return results
+
+
+def failed_contracts(results):
+    return [xlsx_path for xlsx_path, result in results.items() if result["error"]]
+
+
+def duplicate_contracts(xlsx_files):
+    # outputs, records and manifest entries are named after the file name: contracts sharing one would overwrite
+    # each other, so none of them is parsed
+    paths_by_name = defaultdict(list)
+    for xlsx_path in xlsx_files:
+        paths_by_name[os.path.basename(xlsx_path)].append(xlsx_path)
+    return {xlsx_path: paths for paths in paths_by_name.values() if len(paths) > 1 for xlsx_path in paths}
+
+
+def parse_changed_contracts(xlsx_files, max_workers=None, on_progress=None, force=False, cancel_event=None):
+    duplicates = duplicate_contracts(xlsx_files)
+    duplicate_results = {}
+    for xlsx_path, paths in duplicates.items():
+        others = ", ".join(path for path in paths if path != xlsx_path)
+        error = f"another contract has the same file name: {others}"
+        logging.error(f"Not parsing {xlsx_path}: {error}")
+        duplicate_results[xlsx_path] = {"tsv": None, "error": error, "seconds": None}
+        if on_progress:
+            on_progress(xlsx_path, duplicate_results[xlsx_path])
+    xlsx_files = [xlsx_path for xlsx_path in xlsx_files if xlsx_path not in duplicates]
+
+    manifest = load_manifest()
+    changed = changed_contracts(manifest, xlsx_files, force)
+    logging.info(f"{len(changed)} of {len(xlsx_files)} contract(s) are new or changed")
+
+    # cancelled contracts are not marked as parsed, so the next run picks them up
+    results = parse_contracts([xlsx_path for xlsx_path, _ in changed], max_workers, on_progress, cancel_event)
+    for xlsx_path, fingerprint in changed:
+        if xlsx_path in results and not results[xlsx_path]["error"]:
+            mark_parsed(manifest, xlsx_path, fingerprint)
+    mark_templates_learned(manifest)
+    save_manifest(manifest)
+    results.update(duplicate_results)
+    return results
+
+
+def process_contracts(paths, max_workers=None, centralize=True, on_progress=None, force=False, cancel_event=None):
+    results = parse_changed_contracts(list_contracts(paths), max_workers, on_progress, force, cancel_event)
+    if centralize and not failed_contracts(results) and not (cancel_event and cancel_event.is_set()):
+        contract_exporter.main()
+    return results
@@ -1,136 +1,226 @@
+import csv
 import logging
 import os
-import re
 import warnings
+from datetime import datetime
+from functools import lru_cache
 
 from openpyxl import Workbook
 
+from channel_recognizer import ReferenceIndex
+from contract_record import CONTRACT_FIELDS, DATE_FIELDS, RECORD_DIRECTORY, load_record, record_from_text
+from output_paths import OUTPUT_ROOT
+from pack_reference import find_pack_reference, load_pack_file
+
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
-base_dir = os.path.dirname(os.path.abspath(__file__))
-
-CSV_DIRECTORY = os.path.join(base_dir, 'outputs', 'tsv')
-OUTPUT_DIRECTORY = os.path.join(base_dir, 'outputs', 'xlsx')
+CSV_DIRECTORY = os.path.join(OUTPUT_ROOT, 'tsv')
+OUTPUT_DIRECTORY = os.path.join(OUTPUT_ROOT, 'xlsx')
 OUTPUT_FILE = os.path.join(OUTPUT_DIRECTORY, 'centralized_data.xlsx')
-
-keys_patterns = {
-    "Contract Period": r"CONTRACT PERIOD\s+(.+)",
-    "Supplier Name": r"SUPPLIER NAME\s+(.+)",
-    "Vendor VAT number": r"VENDOR VAT NUMBER\s+(.+)",
-    "SAP number vendor": r"SAP NUMBER VENDOR\s+(.+)",
-    "Vendor street": r"STREET\s+(.+)",
-    "Vendor number": r"NUMBER\s+(.+)",
-    "Vendor postal code": r"POSTAL CODE\s+(.+)",
-    "Vendor city": r"CITY\s+(.+)",
-    "Vendor country": r"COUNTRY\s+(.+)",
-    "Payment terms": r"PAYMENT TERMS\s+(.+)",
-    "Delivery Period from": r"FROM\s+([\d-]+ [\d:]+)",
-    "Delivery Period to": r"TO\s+([\d-]+ [\d:]+)",
-    "Renewal": r"RENEWAL\s+(.+)",
-    "Invoicing": r"INVOICING\s+(.+)",
-    "Begin/end period": r"BEGIN/END PERIOD\s+(.+)",
-    "Index": r"!!! Index\s+(.+)",
-    "Monthly fee per user": r"YEAR \d\s+(.+?/year)",
-    "Additional fee": r"ADDITIONAL FEE\s+CALCULATION\s+\(describe pls\)\s+(.+)",
-    "Number of subscribers": r"NUMBER OF SUBSCRIBERS\s+OTHER =\s+\(explain briefly\)\s+(.+)",
-    "Index calculation": r"INDEX\s+CALCULATION OF INDEX\s+(.+)"
-}
-
-
-def extract_data(pattern, text, multiple=False):
-    if multiple:
-        return re.findall(pattern, text)
-    else:
-        match = re.search(pattern, text)
-        return match.group(1).strip() if match else ""
-
-
-def main():
+YEAR_COUNT = 4
+
+# one row per contract x channel x pack, written to the "Channels" sheet and optionally as csv/parquet
+CHANNEL_PACK_SHEET = "Channels"
+CHANNEL_PACK_HEADERS = ["Filename", "Channel", "Pack", "Channel Score", "Pack Score"]
+CHANNEL_PACK_FORMATS = ("csv", "parquet")
+CHANNEL_PACK_FILE = os.path.join(OUTPUT_DIRECTORY, 'channel_packs')
+PARQUET_ROW_GROUP_SIZE = 10000
+
+def read_tsv(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file.read()
+    except UnicodeDecodeError:
+        with open(file_path, 'r', encoding='latin-1') as file:
+            return file.read()
+
+
+def iter_contract_records():
+    record_names = set()
+    if os.path.isdir(RECORD_DIRECTORY):
+        for filename in sorted(os.listdir(RECORD_DIRECTORY)):
+            if filename.endswith(".json"):
+                record = load_record(os.path.join(RECORD_DIRECTORY, filename))
+                if record:
+                    record_names.add(os.path.splitext(filename)[0])
+                    yield record
+
+    for filename in sorted(os.listdir(CSV_DIRECTORY)):
+        base_name, extension = os.path.splitext(filename)
+        if extension == ".tsv" and base_name not in record_names:
+            record = record_from_text(filename, read_tsv(os.path.join(CSV_DIRECTORY, filename)))
+            yield with_reference_pack_names(record)
+
+
+@lru_cache(maxsize=None)
+def pack_index():
+    reference_file = find_pack_reference()
+    return ReferenceIndex(load_pack_file(reference_file)) if reference_file else None
+
+
+def with_reference_pack_names(record):
+    # older .tsv files hold lower-cased pack names: use the spelling of the pack reference
+    index = pack_index()
+    if index:
+        for channel in record["channels"]:
+            channel["packs"] = [(index.match(pack, fuzzy=False) or (pack,))[0] for pack in channel["packs"]]
+    return record
+
+
+def cell_value(field, value):
+    if value is None:
+        return ""
+    if field in DATE_FIELDS and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+def contract_row(record):
+    row = [record["filename"]]
+    row.extend(cell_value(field, record[field]) for _, field, _ in CONTRACT_FIELDS)
+
+    yearly_fees = record["yearly_fixed_fees"]
+    row.extend(yearly_fees.get(str(i + 1), "") for i in range(YEAR_COUNT))
+
+    for channel in record["channels"]:
+        row.append(channel["channel"])
+        row.append(', '.join(channel["packs"]))
+    return row
+
+
+def channel_pack_rows(record):
+    # records made from older .tsv files have no scores
+    for channel in record["channels"]:
+        pack_scores = channel.get("pack_scores", {})
+        for pack in channel["packs"] or [""]:
+            yield [record["filename"], channel["channel"], pack,
+                   channel.get("score", ""), pack_scores.get(pack, "")]
+
+
+class ParquetRowWriter:
+    # writes the channel/pack rows as parquet row groups of PARQUET_ROW_GROUP_SIZE rows, to a temporary file
+    # replaced by commit()
+    def __init__(self, output_file):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(f"Parquet output needs pyarrow: {e}") from e
+
+        self.pa = pa
+        self.output_file = output_file
+        self.temp_file = f"{output_file}.{os.getpid()}.tmp"
+        self.schema = pa.schema(list(zip(CHANNEL_PACK_HEADERS, [pa.string()] * 3 + [pa.float64()] * 2)))
+        self.writer = pq.ParquetWriter(self.temp_file, self.schema)
+        self.rows = []
+
+    def append(self, row):
+        # missing scores are nulls rather than empty strings in a typed column
+        self.rows.append([value if value != "" else None for value in row])
+        if len(self.rows) >= PARQUET_ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            columns = [self.pa.array(column, type=field.type) for column, field in zip(zip(*self.rows), self.schema)]
+            self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def commit(self):
+        os.replace(self.temp_file, self.output_file)
+
+
+def main(channel_pack_formats=()):
     logging.info("Starting the script")
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Centralized Data"
-
     os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
-
-    max_channels = 0
-    for filename in os.listdir(CSV_DIRECTORY):
-        if filename.endswith(".tsv"):
-            file_path = os.path.join(CSV_DIRECTORY, filename)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read()
-            except UnicodeDecodeError:
-                with open(file_path, 'r', encoding='latin-1') as file:
-                    content = file.read()
-
-            channels = extract_data(r"(.+?)\s+\((.+?)\)", content, multiple=True)
-            filtered_channels = [channel for channel in channels if channel[0] not in ["NEW", "old"]]
-            if len(filtered_channels) > max_channels:
-                max_channels = len(filtered_channels)
-
-    logging.info(f"Maximum number of channels: {max_channels}")
-
-    basic_headers = ["Filename"] + list(keys_patterns.keys())
-    channel_headers = []
-    for i in range(max_channels):
-        channel_headers.append(f"Channel {i + 1}")
-        channel_headers.append(f"Packs Channel {i + 1}")
-
-    year_headers = [f"YEAR {i + 1} FIXED FEE IN €" for i in range(4)]
-    headers = basic_headers + year_headers + channel_headers
-
-    ws.append(headers)
-
-    for filename in os.listdir(CSV_DIRECTORY):
-        if filename.endswith(".tsv"):
-            file_path = os.path.join(CSV_DIRECTORY, filename)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read()
-            except UnicodeDecodeError:
-                with open(file_path, 'r', encoding='latin-1') as file:
-                    content = file.read()
-
-            row = [filename]
-            yearly_fees = {}
-            for key in keys_patterns.keys():
-                if key != "YEARLY FIXED FEE IN €":
-                    value = extract_data(keys_patterns[key], content)
-                    row.append(value)
-
-            yearly_fee_pattern = re.compile(r"YEAR (\d+)\s*(\d+)?")
-            matches = yearly_fee_pattern.findall(content)
-            yearly_fees = {f"YEAR {year} FIXED FEE IN €": fee for year, fee in matches if fee}
-
-            for header in year_headers:
-                fee = yearly_fees.get(header, "")
-                if fee and len(fee) > 1:
-                    row.append(fee)
-                else:
-                    row.append("")
-
-            channels = extract_data(r"(.+?)\s+\((.+?)\)", content, multiple=True)
-            filtered_channels = [channel for channel in channels if channel[0] not in ["NEW", "old"]]
-            channels_row = []
-            for channel in filtered_channels:
-                channels_row.append(channel[0])
-                channels_row.append(', '.join([pack.strip() for pack in channel[1].split(',')]))
-
-            while len(channels_row) < len(channel_headers):
-                channels_row.append("")
-
-            final_row = row + channels_row
-            ws.append(final_row)
-
-    if os.path.exists(OUTPUT_FILE):
-        os.remove(OUTPUT_FILE)
-
-    wb.save(OUTPUT_FILE)
-
-    logging.info(f"Centralized Excel file created at: {OUTPUT_FILE}")
+    unknown_formats = set(channel_pack_formats) - set(CHANNEL_PACK_FORMATS)
+    if unknown_formats:
+        raise ValueError(f"Unsupported channel/pack output format: {', '.join(sorted(unknown_formats))}")
+
+    # write-only workbooks stream rows to disk instead of keeping a cell object per value.
+    # each sheet is written to its own temporary file, so the channel/pack sheet can be filled
+    # while the records are first read, before the wide sheet's headers are known
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Centralized Data")
+    channel_pack_sheet = wb.create_sheet(CHANNEL_PACK_SHEET)
+    channel_pack_sheet.append(CHANNEL_PACK_HEADERS)
+
+    # temporary files of this export: a failed export deletes those not moved to their output yet
+    temp_files = []
+    parquet_writer = csv_file = csv_writer = None
+    try:
+        # a requested format that cannot be written fails the export before any file is replaced
+        if "parquet" in channel_pack_formats:
+            parquet_writer = ParquetRowWriter(f"{CHANNEL_PACK_FILE}.parquet")
+            temp_files.append(parquet_writer.temp_file)
+        if "csv" in channel_pack_formats:
+            csv_temp_file = f"{CHANNEL_PACK_FILE}.csv.{os.getpid()}.tmp"
+            temp_files.append(csv_temp_file)
+            csv_file = open(csv_temp_file, 'w', encoding='utf-8', newline='')
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(CHANNEL_PACK_HEADERS)
+
+        # first read of the records: the channel/pack rows, and the number of channel columns of the wide sheet
+        contract_count = 0
+        max_channels = 0
+        try:
+            for record in iter_contract_records():
+                contract_count += 1
+                max_channels = max(max_channels, len(record["channels"]))
+                for channel_pack_row in channel_pack_rows(record):
+                    channel_pack_sheet.append(channel_pack_row)
+                    if csv_writer:
+                        csv_writer.writerow(channel_pack_row)
+                    if parquet_writer:
+                        parquet_writer.append(channel_pack_row)
+        finally:
+            if csv_file:
+                csv_file.close()
+            if parquet_writer:
+                parquet_writer.close()
+        logging.info(f"Maximum number of channels: {max_channels}")
+
+        basic_headers = ["Filename"] + [column for column, _, _ in CONTRACT_FIELDS]
+        channel_headers = []
+        for i in range(max_channels):
+            channel_headers.append(f"Channel {i + 1}")
+            channel_headers.append(f"Packs Channel {i + 1}")
+
+        year_headers = [f"YEAR {i + 1} FIXED FEE IN €" for i in range(YEAR_COUNT)]
+        headers = basic_headers + year_headers + channel_headers
+
+        # second read: the wide rows are streamed below their headers, none is kept in memory
+        ws.append(headers)
+        for record in iter_contract_records():
+            ws.append(contract_row(record))
+
+        # the previous files stay in place until the new ones are complete
+        temp_file = f"{OUTPUT_FILE}.{os.getpid()}.tmp"
+        temp_files.append(temp_file)
+        wb.save(temp_file)
+        os.replace(temp_file, OUTPUT_FILE)
+        logging.info(f"Centralized Excel file created at: {OUTPUT_FILE}")
+
+        if csv_file:
+            os.replace(csv_file.name, f"{CHANNEL_PACK_FILE}.csv")
+            logging.info(f"Channel/pack table created at: {CHANNEL_PACK_FILE}.csv")
+        if parquet_writer:
+            parquet_writer.commit()
+            logging.info(f"Channel/pack table created at: {CHANNEL_PACK_FILE}.parquet")
+        return contract_count
+    finally:
+        for path in temp_files:
+            if os.path.exists(path):
+                os.remove(path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+
+from pack_reference import REFERENCE_DATA_DIR, file_hash, find_pack_reference
+from contract_record import RECORD_VERSION, record_path
+from contract_template import CONFIGURED_TEMPLATE_FILE, LEARNED_TEMPLATE_FILE
+from output_paths import OUTPUT_ROOT
+
+# what each record in outputs/records was parsed from: a contract is parsed again only when its workbook
+# or the pack reference changed. kept outside outputs/records, which only holds contract records
+MANIFEST_FILE = os.path.join(OUTPUT_ROOT, 'manifest.json')
+
+
+def file_fingerprint(file_path, previous=None):
+    stat = os.stat(file_path)
+    fingerprint = {"mtime": stat.st_mtime, "size": stat.st_size}
+    if previous and previous.get("mtime") == fingerprint["mtime"] and previous.get("size") == fingerprint["size"]:
+        # unchanged on disk: no need to read the file again
+        fingerprint["sha1"] = previous.get("sha1")
+    else:
+        fingerprint["sha1"] = file_hash(file_path)
+    return fingerprint
+
+
+def pack_reference_fingerprint():
+    reference_file = find_pack_reference()
+    if reference_file is None:
+        return None
+    fingerprint = {"file": os.path.basename(reference_file), "sha1": file_hash(reference_file)}
+
+    # channel names are part of the reference used to recognize the channel block
+    channels_file = os.path.join(REFERENCE_DATA_DIR, 'channels.tsv')
+    if os.path.exists(channels_file):
+        fingerprint["channels_sha1"] = file_hash(channels_file)
+    return fingerprint
+
+
+def template_file_fingerprint(path):
+    return file_hash(path) if os.path.exists(path) else None
+
+
+def templates_fingerprint():
+    # a contract matching a template is read from the template's cells only
+    return {"configured": template_file_fingerprint(CONFIGURED_TEMPLATE_FILE),
+            "learned": template_file_fingerprint(LEARNED_TEMPLATE_FILE)}
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        manifest = {}
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Ignoring unreadable manifest {MANIFEST_FILE}: {e}")
+        manifest = {}
+    manifest.setdefault("contracts", {})
+    return manifest
+
+
+def save_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_FILE), exist_ok=True)
+    temp_path = f"{MANIFEST_FILE}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, MANIFEST_FILE)
+
+
+def changed_contracts(manifest, xlsx_files, force=False):
+    packs = pack_reference_fingerprint()
+    templates = templates_fingerprint()
+    if (force or manifest.get("packs") != packs or manifest.get("templates") != templates
+            or manifest.get("record_version") != RECORD_VERSION):
+        if manifest["contracts"] and not force:
+            logging.info("Pack reference, contract templates or record format changed, "
+                         "all contracts will be parsed again")
+        manifest["contracts"] = {}
+    manifest["packs"] = packs
+    manifest["templates"] = templates
+    manifest["record_version"] = RECORD_VERSION
+
+    changed = []
+    for xlsx_path in xlsx_files:
+        name = os.path.basename(xlsx_path)
+        previous = manifest["contracts"].get(name)
+        fingerprint = file_fingerprint(xlsx_path, previous)
+        if previous and previous.get("sha1") == fingerprint["sha1"] and os.path.exists(record_path(xlsx_path)):
+            # touched but identical content: keep the cached record
+            previous.update(fingerprint)
+        else:
+            changed.append((xlsx_path, fingerprint))
+    return changed
+
+
+def mark_templates_learned(manifest):
+    # templates learned by this run come from full scans, which give the same records: the cached records
+    # stay valid with them
+    manifest["templates"]["learned"] = template_file_fingerprint(LEARNED_TEMPLATE_FILE)
+
+
+def mark_parsed(manifest, xlsx_path, fingerprint):
+    manifest["contracts"][os.path.basename(xlsx_path)] = dict(fingerprint, path=os.path.abspath(xlsx_path))
@@ -6,15 +6,18 @@ import logging
 import glob
 import pandas as pd
 from openpyxl import load_workbook
-from openpyxl.cell.cell import Cell
-from collections import defaultdict
+from functools import lru_cache
+
+from channel_recognizer import ChannelRecognizer
+from contract_record import ContractRecordBuilder, save_record
+from contract_template import TemplateLearner, match_template, remember_template, save_learned_template
+from output_paths import OUTPUT_ROOT
+from pack_reference import REFERENCE_DATA_DIR, find_pack_reference, load_pack_file, unique_pack_names
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-REFERENCE_DATA_DIR = os.path.join(BASE_DIR, 'inputs')
-OUTPUT_DIR = os.path.join(BASE_DIR, 'outputs/tsv')
+OUTPUT_DIR = os.path.join(OUTPUT_ROOT, 'tsv')
 
 def ensure_output_dir():
     if not os.path.exists(OUTPUT_DIR):
@@ -23,138 +26,140 @@ def ensure_output_dir():
         os.makedirs(REFERENCE_DATA_DIR)
 
 
-def extract_text_from_xlsx(xlsx_path):
+EXCLUSION_LIST = [
+    "REQUEST FOR PO BROADCASTING CONTENT", "vendor data", "!! COMPANY ISSUING INVOICES !!", "(landcode + number)",
+    "(if existing in sap)", "NAME OF CHANNEL", "COMFORT / BOUQUET…", "new", "old",
+    "(if fee varies per range of number of subcribers, pls indicate in detail underneath)",
+    "from … to …. number of subscribers", "(describe pls)", "(explain briefly)",
+    "(invoice dated beginning of invoicing period or end of invoicing period)",
+    "CALCULATION OF INDEX",
+    "berekend op het aantal abonnees op het einde van elk kwartaal in het verzorgingsgebied van de omroeporganisatie",
+    "(cd remarks)"
+]
+# One scan per cell instead of one substring test per phrase (matched against the lower-cased value)
+EXCLUSION_PATTERN = re.compile("|".join(re.escape(phrase.lower()) for phrase in EXCLUSION_LIST))
+
+
+def iter_cells(workbook):
+    for sheet in workbook:
+        if hasattr(sheet, 'reset_dimensions'):
+            # read-only sheets trust the stored dimension, which formatted templates often get wrong
+            sheet.reset_dimensions()
+        for row in sheet.iter_rows():
+            for cell in row:
+                if cell.value is not None and cell.data_type != 'f':
+                    yield sheet.title, cell.row, cell.column, cell.value
+
+
+def parse_contract_workbook(xlsx_path, read_only=True, recognizer=None, use_templates=True, on_template=None):
+    # on_template(template) receives a newly learned template instead of it being written to templates.json:
+    # parsing workers hand theirs to the parent process, the only one writing the file
     try:
-        workbook = load_workbook(filename=xlsx_path, data_only=True)
+        workbook = load_workbook(filename=xlsx_path, data_only=True, read_only=read_only)
     except PermissionError as e:
         logging.error(f"Permission denied: {e}. Skipping file {xlsx_path}")
-        return None
+        return None, None
     except Exception as e:
         logging.error(f"Failed to load workbook: {e}")
-        return None
+        return None, None
 
     text_content = []
     channels_included = []
-    exclusion_list = [
-        "REQUEST FOR PO BROADCASTING CONTENT", "vendor data", "!! COMPANY ISSUING INVOICES !!", "(landcode + number)",
-        "(if existing in sap)", "NAME OF CHANNEL", "COMFORT / BOUQUET…", "new", "old",
-        "(if fee varies per range of number of subcribers, pls indicate in detail underneath)",
-        "from … to …. number of subscribers", "(describe pls)", "(explain briefly)",
-        "(invoice dated beginning of invoicing period or end of invoicing period)",
-        "CALCULATION OF INDEX",
-        "berekend op het aantal abonnees op het einde van elk kwartaal in het verzorgingsgebied van de omroeporganisatie",
-        "(cd remarks)"
-    ]
-
     in_channels_section = False
-    stop_processing = False
 
     period = extract_period_from_filename(xlsx_path)
     if period:
         text_content.append("CONTRACT PERIOD")
         text_content.append(period)
+    record_builder = ContractRecordBuilder(os.path.basename(xlsx_path), period)
 
-    for sheet in workbook:
-        for row in sheet.iter_rows(min_row=1, max_row=sheet.max_row, min_col=1, max_col=sheet.max_column):
-            for cell in row:
-                if stop_processing:
-                    break
-                column = cell.column_letter if isinstance(cell, Cell) else cell.coordinate.split(str(cell.row))[0]
-                if cell.value is not None and cell.data_type != 'f':
-                    cell_value_str = str(cell.value).strip()
+    try:
+        template, template_values = match_template(workbook) if use_templates else (None, None)
+        if template:
+            # only the template's columns, down to its last field, were read
+            logging.info(f"Using contract template '{template['name']}' for {os.path.basename(xlsx_path)}")
+            cells = ((None, None, None, value) for value in template_values)
+            learner = None
+        else:
+            cells = iter_cells(workbook)
+            learner = TemplateLearner() if use_templates else None
+
+        for sheet_title, row, column, value in cells:
+            cell_value_str = str(value).strip()
+            use = None
+            section = None
+
+            if EXCLUSION_PATTERN.search(cell_value_str.lower()):
+                # some field labels contain an excluded phrase ("RENEWAL")
+                if not in_channels_section:
+                    label = record_builder.add_label(cell_value_str)
+                    use = ("label", label) if label else None
+                else:
+                    # "NAME OF CHANNEL", "new", "old"...: the columns of the channel block
+                    section = "channel_header"
+            elif "ADDITIONAL INFORMATION" in cell_value_str or "ADDITIONAL INFO" in cell_value_str:
+                # nothing after this marker is used, in this sheet or the following ones
+                break
+            elif "CHANNEL INFORMATION" in cell_value_str:
+                in_channels_section = True
+                record_builder.end_field()
+                section = "channels_start"
+            elif "DELIVERY PERIOD/DATE" in cell_value_str:
+                in_channels_section = False
+                text_content.append(cell_value_str)
+                record_builder.end_field()
+                section = "channels_end"
+            elif in_channels_section:
+                channels_included.append(cell_value_str)
+                section = "channel"
+            else:
+                text_content.append(cell_value_str)
+                use = record_builder.add_cell(value)
+
+            if learner:
+                learner.observe(sheet_title, row, column, cell_value_str, use, section)
+    finally:
+        workbook.close()
 
-                    if any(exclusion_phrase.lower() in cell_value_str.lower() for exclusion_phrase in exclusion_list):
-                        continue
+    if learner:
+        learned_template = learner.template()
+        if learned_template:
+            remember_template(learned_template)
+            (on_template or save_learned_template)(learned_template)
 
-                    if "ADDITIONAL INFORMATION" in cell_value_str or "ADDITIONAL INFO" in cell_value_str:
-                        stop_processing = True
-                        break
+    if channels_included:
+        channels = match_channel_packs(channels_included, recognizer)
+        text_content.append(format_channel_packs(channels))
+        record_builder.set_channels(channels)
 
-                    if "CHANNEL INFORMATION" in cell_value_str:
-                        in_channels_section = True
-                        continue
+    return "\n".join(text_content), record_builder.record
 
-                    if "DELIVERY PERIOD/DATE" in cell_value_str:
-                        in_channels_section = False
-                        text_content.append(cell_value_str)
-                        continue
 
-                    if in_channels_section:
-                        channels_included.append(cell_value_str)
-                    else:
-                        text_content.append(cell_value_str)
+def extract_text_from_xlsx(xlsx_path, read_only=True, recognizer=None):
+    text_content, _ = parse_contract_workbook(xlsx_path, read_only, recognizer)
+    return text_content
 
-    if channels_included:
-        channels_text = parse_channel_information(channels_included)
-        text_content.append(channels_text)
-
-    return "\n".join(text_content)
-
-
-def parse_channel_information(channels_included):
-    existing_packs = load_existing_packs()
-
-    existing_channels = [
-        "A", "AB3", "ABXplore", "Action", "Al Jazeera English", "Animal Planet", "Animal Planet SD NL",
-        "Animal Planet SD FR", "Animaux",
-        "Antenne Centre Télévision", "Automoto", "Arte", "B", "Baby TV", "BBC First",
-        "BBC News", "Be 1", "BRF TV", "C",
-        "Cartoon Network", "Cartoonito",
-        "CGTN", "China Global Television Network", "CNBC Europe", "CRIME DISTRICT",
-        "CNN International", "Comedy Central", "Crime district", "D",
-        "Discovery Channel", "Discovery Channel SD NL", "Discovery Channel SD FR", "Discovery Science",
-        "Disney Channel", "Disney Channel", "Discovery Channel HD FR", "Discovery Channel HD NL",
-        "Discovery World SD NL", "Discovery World SD FR", "E",
-        "E!", "VRT 1", "ESPN Classic",
-        "Euronews", "Eurosport", "Eurosport 1", "Eurosport 2", "EUX.TV", "F",
-        "Fox Life", "H", "History", "I",
-        "Investigation Discovery", "Investigations Discovery NL", "Investigations Discovery FR", "J", "JIM", "K",
-        "Kadet", "Ketnet", "M", "M6 Boutique", "Mangas", "MTV", "N",
-        "National Geographic", "National Geographic Wild",
-        "NickMusic EMEA", "Nick Jr.", "Nickelodeon",
-        "Nickelodeon", "Nicktoons", "P", "Pebble TV", "Play More", "Play4",
-        "Play5", "Play6", "Prime Action", "Prime Family", "Prime Fezztival",
-        "Prime Series", "Prime Star", "Private Spice", "Q", "Qmusic TV", "R", "Regionale Televiesieomroep TV Limburg",
-        "RT", "RTBF", "RTL Club", "RTL Plug", "RTL-TVI", "S", "Science et Vie TV", "ShortsTV",
-        "Star Channel", "Stingray Classica", "Stingray Djazz",
-        "Stingray iConcerts", "Stingray Lite TV", "T", "Tipik", "TiVi5 Monde", "TLC HD NL",
-        "TMF Dance", "TMF NL", "TMF Pure", "TNT", "Trek", "La Trois",
-        "TV Oranje", "TV5Monde", "U", "La Une", "V", "VRT Canvas", "VTM",
-        "VTM 2", "VTM 3", "VTM Kids", "VTM Non-Stop Dokters", "X", "Xite"
-    ]
 
-    possible_packs_set = set(pack.lower() for pack in existing_packs)
-    possible_channels_set = set(channel.lower() for channel in existing_channels)
-    channels = defaultdict(set)
-    current_channel = None
-
-    for line in channels_included:
-        line = line.strip().lower()
-        if not line:
-            continue
-
-        if line in possible_packs_set:
-            if current_channel:
-                channels[current_channel].add(line)
-        elif line in possible_channels_set:
-            current_channel = line
-        elif "&" in line:
-            parts = line.split("&")
-            full_pack_name = line
-            if full_pack_name in possible_packs_set and current_channel:
-                channels[current_channel].add(full_pack_name)
-            else:
-                for part in parts:
-                    part = part.strip()
-                    if current_channel and part in possible_packs_set:
-                        channels[current_channel].add(part)
+@lru_cache(maxsize=None)
+def default_recognizer():
+    return ChannelRecognizer(load_existing_packs(), load_channel_reference())
+
+
+def match_channel_packs(channels_included, recognizer=None):
+    recognizer = recognizer or default_recognizer()
+    channels = recognizer.recognize(channels_included)
+    for channel in channels:
+        if channel["score"] < 100:
+            logging.info(f"Channel recognized by fuzzy match: {channel['channel']} ({channel['score']})")
+    return channels
+
+
+def format_channel_packs(channels):
+    return "\n".join(f"{channel['channel']} ({', '.join(channel['packs'])})" for channel in channels)
 
-    output_lines = []
-    for channel, packs in channels.items():
-        packs_str = ", ".join(sorted(packs))
-        output_lines.append(f"{channel.capitalize()} ({packs_str})")
 
-    return "\n".join(output_lines)
+def parse_channel_information(channels_included, recognizer=None):
+    return format_channel_packs(match_channel_packs(channels_included, recognizer))
 
 
 def extract_period_from_filename(filename):
@@ -181,22 +186,25 @@ def extract_period_from_filename(filename):
 
 
 def load_existing_packs():
-    latest_files = glob.glob(os.path.join(REFERENCE_DATA_DIR, 'Product_Grouping_Latest*.xlsx'))
-    if latest_files:
-        latest_file = max(latest_files, key=os.path.getctime)
-        logging.info(f"Using latest Product_Grouping_Latest file: {latest_file}")
+    reference_file = find_pack_reference()
+    if reference_file is None:
+        logging.error("No suitable reference file found.")
+        sys.exit(1)
 
-        df = pd.read_excel(latest_file, usecols=['PROD_MSY_GRP'])
-        return df['PROD_MSY_GRP'].tolist()
+    logging.info(f"Using pack reference file: {reference_file}")
+    return load_pack_file(reference_file)
 
-    packs_tv_file = os.path.join(REFERENCE_DATA_DIR, 'packsTV.tsv')
-    if os.path.exists(packs_tv_file):
-        logging.info(f"Using packsTV.tsv file: {packs_tv_file}")
-        packs_tv_df = pd.read_csv(packs_tv_file, sep='\t')
-        return packs_tv_df['PROD_MSY_GRP'].tolist()
 
-    logging.error("No suitable reference file found.")
-    sys.exit(1)
+def load_channel_reference():
+    channels_file = os.path.join(REFERENCE_DATA_DIR, 'channels.tsv')
+    if not os.path.exists(channels_file):
+        # without it no channel block is recognized and every record would be empty
+        logging.error(f"{channels_file} does not exist.")
+        sys.exit(1)
+
+    logging.info(f"Using channels.tsv file: {channels_file}")
+    channels_df = pd.read_csv(channels_file, sep='\t')
+    return channels_df['CHANNEL'].tolist()
 
 
 def process_directory(folder_path):
@@ -226,22 +234,16 @@ def process_directory(folder_path):
     latest_file = max(latest_files, key=os.path.getctime)
     logging.info(f"Latest file found: {latest_file}")
 
-    df = pd.read_excel(latest_file, usecols=['PROD_MSY_GRP'])
-
     packs_tv_file = os.path.join(REFERENCE_DATA_DIR, 'packsTV.tsv')
     if not os.path.exists(packs_tv_file):
         logging.error(f"{packs_tv_file} does not exist.")
         return
 
-    packs_tv_df = pd.read_csv(packs_tv_file, sep='\t')
-    existing_packs = packs_tv_df['PROD_MSY_GRP'].tolist()
+    existing_packs = load_pack_file(packs_tv_file)
     logging.info(f"Loaded {len(existing_packs)} packs from {packs_tv_file}")
 
-    additional_df = pd.DataFrame(existing_packs, columns=['PROD_MSY_GRP'])
-
-    combined_df = pd.concat([df, additional_df])
-
-    df_unique = combined_df.drop_duplicates()
+    df_unique = pd.DataFrame(unique_pack_names(load_pack_file(latest_file) + existing_packs),
+                             columns=['PROD_MSY_GRP'])
 
     tsv_file = os.path.join(OUTPUT_DIR, 'PROD_MSY_GRP_unique.tsv')
     df_unique.to_csv(tsv_file, sep='\t', index=False)
@@ -260,6 +262,7 @@ def save_to_tsv(content, file_path):
         with open(output_path, 'w') as file:
             file.write(content)
         logging.info(f"Successfully saved: {output_path}")
+        return output_path
     except Exception as e:
         logging.error(f"Error saving file {output_path}: {e}")
 
@@ -278,10 +281,11 @@ def main():
 
     ensure_output_dir()
 
-    result = extract_text_from_xlsx(file_path)
+    result, record = parse_contract_workbook(file_path)
     if result:
         print(result)
         save_to_tsv(result, file_path)
+        save_record(record, file_path)
     else:
         logging.error("Failed to extract text")
 
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import re
+from datetime import date, datetime
+
+from output_paths import OUTPUT_ROOT
+
+RECORD_DIRECTORY = os.path.join(OUTPUT_ROOT, 'records')
+# version 2: records read through a template no longer miss fields left blank when it was learned
+RECORD_VERSION = 2
+
+# (column in centralized_data.xlsx, record field, label cell in the contract template)
+CONTRACT_FIELDS = [
+    ("Contract Period", "contract_period", "CONTRACT PERIOD"),
+    ("Supplier Name", "supplier_name", "SUPPLIER NAME"),
+    ("Vendor VAT number", "vendor_vat_number", "VENDOR VAT NUMBER"),
+    ("SAP number vendor", "sap_number_vendor", "SAP NUMBER VENDOR"),
+    ("Vendor street", "vendor_street", "STREET"),
+    ("Vendor number", "vendor_number", "NUMBER"),
+    ("Vendor postal code", "vendor_postal_code", "POSTAL CODE"),
+    ("Vendor city", "vendor_city", "CITY"),
+    ("Vendor country", "vendor_country", "COUNTRY"),
+    ("Payment terms", "payment_terms", "PAYMENT TERMS"),
+    ("Delivery Period from", "delivery_period_from", "FROM"),
+    ("Delivery Period to", "delivery_period_to", "TO"),
+    ("Renewal", "renewal", "RENEWAL"),
+    ("Invoicing", "invoicing", "INVOICING"),
+    ("Begin/end period", "begin_end_period", "BEGIN/END PERIOD"),
+    ("Index", "index", "!!! INDEX"),
+    ("Monthly fee per user", "monthly_fee_per_user", None),
+    ("Additional fee", "additional_fee", "ADDITIONAL FEE"),
+    ("Number of subscribers", "number_of_subscribers", "NUMBER OF SUBSCRIBERS"),
+    ("Index calculation", "index_calculation", "INDEX"),
+]
+FIELD_BY_LABEL = {label: field for _, field, label in CONTRACT_FIELDS if label}
+DATE_FIELDS = {"delivery_period_from", "delivery_period_to"}
+
+# labels between a field label and its value, or labels without a value, in the contract template
+IGNORED_LABELS = {"CALCULATION", "OTHER =", "CALCULATION OF INDEX", "TOTAL"}
+YEAR_LABEL_PATTERN = re.compile(r"YEAR (\d+)$")
+# "Channel (pack, pack)" lines written at the end of a parsed contract .tsv
+CHANNEL_LINE_PATTERN = re.compile(r"(.+?)\s+\((.+)\)$")
+
+
+def new_record(filename, contract_period=None):
+    record = {"version": RECORD_VERSION, "filename": filename}
+    for _, field, _ in CONTRACT_FIELDS:
+        record[field] = None
+    record["contract_period"] = contract_period
+    record["yearly_fixed_fees"] = {}
+    record["channels"] = []
+    return record
+
+
+def typed_value(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+class ContractRecordBuilder:
+    # add_label/add_cell return what the cell was used for, ("label", label) or ("value", label),
+    # so that contract_template can learn where each field sits in the workbook
+    def __init__(self, filename, contract_period=None):
+        self.record = new_record(filename, contract_period)
+        self.pending = None
+        self.pending_year = None
+        self.pending_label = None
+
+    def add_label(self, text):
+        label = text.strip().upper()
+        field = FIELD_BY_LABEL.get(label)
+        if field:
+            self.pending = field if self.record[field] is None else None
+            self.pending_year = None
+            self.pending_label = label
+            return label
+
+        year = YEAR_LABEL_PATTERN.match(label)
+        if year:
+            self.pending = None
+            self.pending_year = year.group(1)
+            self.pending_label = label
+            return label
+
+        return label if label in IGNORED_LABELS else None
+
+    def add_cell(self, value):
+        text = str(value).strip()
+        label = self.add_label(text)
+        if label:
+            return "label", label
+
+        if text.endswith("/year"):
+            if self.record["monthly_fee_per_user"] is None:
+                self.record["monthly_fee_per_user"] = text
+                return "value", None
+            return None
+
+        if self.pending_year:
+            if isinstance(value, str) and value.isdigit():
+                value = int(value)
+            self.pending_year, year = None, self.pending_year
+            if isinstance(value, (int, float)) and year not in self.record["yearly_fixed_fees"]:
+                self.record["yearly_fixed_fees"][year] = value
+                return "value", self.pending_label
+        elif self.pending:
+            self.record[self.pending] = typed_value(value)
+            self.pending = None
+            return "value", self.pending_label
+        return None
+
+    def end_field(self):
+        self.pending = None
+        self.pending_year = None
+        self.pending_label = None
+
+    def set_channels(self, channels):
+        self.record["channels"] = channels
+
+
+def record_from_text(filename, content):
+    lines = [line.strip() for line in content.splitlines() if line.strip()]
+
+    # the channel lines are the trailing block of the text
+    channels_start = len(lines)
+    while channels_start > 0 and CHANNEL_LINE_PATTERN.match(lines[channels_start - 1]):
+        channels_start -= 1
+
+    builder = ContractRecordBuilder(filename)
+    for line in lines[:channels_start]:
+        builder.add_cell(line)
+
+    channels = []
+    for line in lines[channels_start:]:
+        channel, packs = CHANNEL_LINE_PATTERN.match(line).groups()
+        channels.append({"channel": channel, "packs": [pack.strip() for pack in packs.split(',')]})
+    builder.set_channels(channels)
+    return builder.record
+
+
+def record_path(source_path, directory=RECORD_DIRECTORY):
+    base_name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(directory, f"{base_name}.json")
+
+
+def save_record(record, source_path, directory=RECORD_DIRECTORY):
+    os.makedirs(directory, exist_ok=True)
+    output_path = record_path(source_path, directory)
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(record, file, ensure_ascii=False)
+        os.replace(temp_path, output_path)
+        logging.info(f"Successfully saved: {output_path}")
+        return output_path
+    except Exception as e:
+        logging.error(f"Error saving record {output_path}: {e}")
+
+
+def load_record(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            record = json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.error(f"Failed to read record {path}: {e}")
+        return None
+
+    if record.get("version") != RECORD_VERSION:
+        logging.warning(f"Ignoring record with an unsupported version: {path}")
+        return None
+    return record
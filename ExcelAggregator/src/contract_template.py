@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+
+from contract_record import FIELD_BY_LABEL, YEAR_LABEL_PATTERN
+from output_paths import OUTPUT_ROOT
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+# templates written by hand, then the ones learned from full scans of contracts without a matching template
+CONFIGURED_TEMPLATE_FILE = os.path.join(base_dir, 'inputs', 'contract_templates.json')
+LEARNED_TEMPLATE_FILE = os.path.join(OUTPUT_ROOT, 'templates.json')
+# templates of another version do not have the cells this module checks, they are ignored
+TEMPLATE_VERSION = 2
+
+CHANNEL_START_LABEL = "CHANNEL INFORMATION"
+CHANNEL_END_LABEL = "DELIVERY PERIOD/DATE"
+# contract_parser stops reading the workbook at this marker
+STOP_MARKER = "ADDITIONAL INFO"
+# a template whose channel block does not end within this many rows does not fit the workbook
+MAX_CHANNEL_ROWS = 1000
+
+_templates = None
+
+
+def read_template_file(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            templates = json.load(file)
+    except FileNotFoundError:
+        return []
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Ignoring unreadable template file {path}: {e}")
+        return []
+
+    current = [template for template in templates if template.get("version") == TEMPLATE_VERSION]
+    if len(current) < len(templates):
+        logging.info(f"Ignoring {len(templates) - len(current)} template(s) of another version in {path}")
+    return current
+
+
+def load_templates():
+    global _templates
+    if _templates is None:
+        _templates = read_template_file(CONFIGURED_TEMPLATE_FILE) + read_template_file(LEARNED_TEMPLATE_FILE)
+    return _templates
+
+
+def remember_template(template):
+    # used by the next contracts of this process, without writing it
+    if template not in load_templates():
+        load_templates().append(template)
+
+
+def save_learned_template(template):
+    # only called from one process at a time (the batch's parent): templates.json is read, extended and replaced
+    remember_template(template)
+    templates = read_template_file(LEARNED_TEMPLATE_FILE)
+    if template in templates:
+        return
+    templates.append(template)
+
+    os.makedirs(os.path.dirname(LEARNED_TEMPLATE_FILE), exist_ok=True)
+    temp_path = f"{LEARNED_TEMPLATE_FILE}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(templates, file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, LEARNED_TEMPLATE_FILE)
+    logging.info(f"Learned contract template '{template['name']}' from sheet {template['sheet']}")
+
+
+def cell_text(value):
+    return str(value).strip() if value is not None else ""
+
+
+def is_value_label(text):
+    # labels of a record field or a yearly fee, followed by their value
+    label = text.upper()
+    return label in FIELD_BY_LABEL or YEAR_LABEL_PATTERN.match(label) is not None
+
+
+def template_extent(template):
+    # (last column, last row below the channel block) holding a cell the template reads or checks
+    channels = template["channels"]
+    columns = [template["anchor"][1], channels["end_column"], channels["max_column"]]
+    columns.extend(column for _, column, _ in channels["header"])
+    after_rows = [0]
+    for fields, row_offsets in ((template["fields"], None), (template["fields_after_channels"], after_rows)):
+        for _, label_cell, value_cell in fields:
+            for cell in (label_cell, value_cell):
+                if cell:
+                    columns.append(cell[1])
+                    if row_offsets is not None:
+                        row_offsets.append(cell[0])
+    columns.extend(column for _, column in template["label_cells"] + template["label_cells_after_channels"])
+    after_rows.extend(row for row, _ in template["label_cells_after_channels"])
+    return max(columns), max(after_rows)
+
+
+def read_rows(sheet, template):
+    # the template's columns only, from the first row to its last field below the channel block:
+    # the rest of the sheet is not parsed
+    max_column, after_rows = template_extent(template)
+    start_row = template["channels"]["start_row"]
+    end_column = template["channels"]["end_column"]
+    rows = []
+    channel_end_row = None
+
+    for row_index, row in enumerate(sheet.iter_rows(min_row=1, max_row=start_row + MAX_CHANNEL_ROWS + after_rows,
+                                                    max_col=max_column, values_only=True), start=1):
+        rows.append(row)
+        if any(isinstance(value, str) and STOP_MARKER in value for value in row):
+            if channel_end_row is None:
+                # a full scan stops before the end of the channel block
+                return None, None
+            break
+        if channel_end_row is None and row_index > start_row:
+            if cell_text(row[end_column - 1]) == CHANNEL_END_LABEL:
+                channel_end_row = row_index
+            elif row_index > start_row + MAX_CHANNEL_ROWS:
+                return None, None
+        if channel_end_row is not None and row_index >= channel_end_row + after_rows:
+            break
+
+    return rows, channel_end_row
+
+
+def cells_outside_template(rows, template, channel_end_row):
+    # True when a field label or a channel cell within the template's columns sits where the template did not
+    # learn one: the template would skip it, so the workbook has to be scanned in full
+    channels = template["channels"]
+    label_cells = {tuple(cell) for cell in template["label_cells"]}
+    label_cells.update((row + channel_end_row, column) for row, column in template["label_cells_after_channels"])
+
+    for row_index, row in enumerate(rows, start=1):
+        in_channels = channels["start_row"] < row_index < channel_end_row
+        for column, value in enumerate(row, start=1):
+            if value is None:
+                continue
+            text = cell_text(value)
+            if in_channels:
+                if not channels["min_column"] <= column <= channels["max_column"]:
+                    return True
+            elif is_value_label(text) and (row_index, column) not in label_cells:
+                return True
+    return False
+
+
+def template_cell_values(sheet, template):
+    rows, channel_end_row = read_rows(sheet, template)
+    if channel_end_row is None:
+        return None
+
+    def value_at(row, column):
+        if row < 1 or row > len(rows) or column > len(rows[row - 1]):
+            return None
+        return rows[row - 1][column - 1]
+
+    anchor_row, anchor_column, anchor_text = template["anchor"]
+    if cell_text(value_at(anchor_row, anchor_column)) != anchor_text:
+        return None
+
+    channels = template["channels"]
+    for row, column, text in channels["header"]:
+        if cell_text(value_at(row, column)) != text:
+            return None
+
+    if cells_outside_template(rows, template, channel_end_row):
+        return None
+
+    # cells read for a field: a blank field's row is read from its label on, skipping these
+    learned_cells = set()
+    for fields, row_offset in ((template["fields"], 0), (template["fields_after_channels"], channel_end_row)):
+        for _, label_cell, value_cell in fields:
+            for cell in (label_cell, value_cell):
+                if cell:
+                    learned_cells.add((cell[0] + row_offset, cell[1]))
+
+    values = []
+
+    def add_field(label, label_cell, value_cell, row_offset=0):
+        if label_cell:
+            row = label_cell[0] + row_offset
+            if cell_text(value_at(row, label_cell[1])).upper() != label:
+                return False
+            values.append(label)
+            if value_cell is None and is_value_label(label):
+                # blank when the template was learned: any value right of the label, within the template's columns
+                for column in range(label_cell[1] + 1, len(rows[row - 1]) + 1):
+                    value = value_at(row, column)
+                    if value is not None and (row, column) not in learned_cells:
+                        values.append(value)
+        if value_cell:
+            value = value_at(value_cell[0] + row_offset, value_cell[1])
+            if value is not None:
+                values.append(value)
+        return True
+
+    for label, label_cell, value_cell in template["fields"]:
+        if not add_field(label, label_cell, value_cell):
+            return None
+
+    values.append(CHANNEL_START_LABEL)
+    for row in range(channels["start_row"] + 1, channel_end_row):
+        for column in range(channels["min_column"], channels["max_column"] + 1):
+            value = value_at(row, column)
+            if value is not None:
+                values.append(value)
+    values.append(CHANNEL_END_LABEL)
+
+    for label, label_cell, value_cell in template["fields_after_channels"]:
+        if not add_field(label, label_cell, value_cell, channel_end_row):
+            return None
+
+    return values
+
+
+def match_template(workbook):
+    for template in load_templates():
+        if template["sheet"] not in workbook.sheetnames:
+            continue
+        values = template_cell_values(workbook[template["sheet"]], template)
+        if values is not None:
+            return template, values
+    return None, None
+
+
+class TemplateLearner:
+    def __init__(self):
+        self.sheet = None
+        self.anchor = None
+        self.fields = {}
+        self.label_cells = set()
+        self.channel_start = None
+        self.channel_end = None
+        self.channel_columns = set()
+        self.channel_header = []
+
+    def observe(self, sheet_title, row, column, text, use=None, section=None):
+        if self.sheet is None:
+            self.sheet = sheet_title
+            self.anchor = [row, column, text]
+        if sheet_title != self.sheet:
+            return
+
+        if section == "channels_start" and self.channel_start is None:
+            self.channel_start = (row, column)
+        elif section == "channels_end" and self.channel_end is None:
+            self.channel_end = (row, column)
+        elif section in ("channel", "channel_header"):
+            self.channel_columns.add(column)
+            if section == "channel_header" and (not self.channel_header or self.channel_header[0][0] == row):
+                self.channel_header.append([row, column, text])
+        elif use:
+            kind, label = use
+            if label is None:
+                # a value found without a label (the fee per user)
+                self.fields[f"{row}:{column}"] = [None, None, [row, column]]
+                return
+            field = self.fields.setdefault(label, [label, None, None])
+            if kind == "label":
+                # every label is kept, even without a value, so a later contract filling it is read
+                if is_value_label(label):
+                    self.label_cells.add((row, column))
+                if field[2] is None:
+                    field[1] = [row, column]
+            elif field[2] is None:
+                field[2] = [row, column]
+
+    def template(self):
+        if not (self.channel_start and self.channel_end and self.channel_columns):
+            return None
+
+        start_row = self.channel_start[0]
+        end_row = self.channel_end[0]
+        fields = []
+        fields_after_channels = []
+        for label, label_cell, value_cell in self.fields.values():
+            cells = [cell for cell in (label_cell, value_cell) if cell]
+            if not cells:
+                continue
+            if all(cell[0] < start_row for cell in cells):
+                fields.append([label, label_cell, value_cell])
+            elif all(cell[0] > end_row for cell in cells):
+                fields_after_channels.append([label,
+                                              [label_cell[0] - end_row, label_cell[1]] if label_cell else None,
+                                              [value_cell[0] - end_row, value_cell[1]] if value_cell else None])
+        if not fields:
+            return None
+
+        def position(field):
+            return field[1] or field[2]
+
+        # the block spans the columns of its header row ("NAME OF CHANNEL", "new", "old"...), even when
+        # this contract left some of them empty
+        return {
+            "version": TEMPLATE_VERSION,
+            "name": self.anchor[2],
+            "sheet": self.sheet,
+            "anchor": self.anchor,
+            "channels": {
+                "start_row": start_row,
+                "end_column": self.channel_end[1],
+                "min_column": min(self.channel_columns),
+                "max_column": max(self.channel_columns),
+                "header": self.channel_header,
+            },
+            "fields": sorted(fields, key=position),
+            "fields_after_channels": sorted(fields_after_channels, key=position),
+            "label_cells": sorted([row, column] for row, column in self.label_cells if row < start_row),
+            "label_cells_after_channels": sorted([row - end_row, column] for row, column in self.label_cells
+                                                 if row > end_row),
+        }
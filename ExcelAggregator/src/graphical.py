@@ -4,7 +4,7 @@ import subprocess
 import sys
 import os
 import glob
-import threading
+import multiprocessing
 import shutil
 
 
@@ -23,10 +23,13 @@ def check_and_install_packages():
             print(f"{package} installed successfully.")
 
 
+# how often the main loop reads the events of a running job
+JOB_POLL_INTERVAL_MS = 100
+
+
 class SimpleGUI:
     def __init__(self, root):
         self.root = root
-        self.python_executable = os.getenv('PYTHON_EXEC', 'python')
         self.root.title("Simple Excel Parser and Centralizer")
         self.root.geometry('700x350')
         self.apply_dark_mode()
@@ -74,6 +77,9 @@ class SimpleGUI:
                                         bg="#555555", fg="white")
         self.process_button.pack(side=tk.LEFT, padx=5, anchor='center')
 
+        self.cancel_button = tk.Button(self.button_frame, text="Cancel", command=self.cancel_processing,
+                                       bg="#555555", fg="white")
+
         self.view_result_button = tk.Button(self.button_frame, text="View Result", command=self.view_result,
                                             bg="#555555", fg="white")
         self.view_result_button.pack(side=tk.RIGHT, padx=5, anchor='center')
@@ -83,6 +89,9 @@ class SimpleGUI:
         self.extract_button.pack(side=tk.RIGHT, padx=5, anchor='center')
 
         self.directory = ""
+        self.job = None
+        self.parsed_count = 0
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
         self.update_tsv_list()
 
@@ -152,27 +161,13 @@ class SimpleGUI:
     def get_python_executable(self):
         return sys.executable
 
-    def run_script(self, script_name, file_path):
-        try:
-            script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script_name)
-            command = [self.python_executable, script_path, file_path]  # Now it takes a file path
-
-            print(f"Running command: {' '.join(command)}")
-
-            env = os.environ.copy()
-            env['RUNNING_AS_SUBPROCESS'] = '1'
-
-            result = subprocess.run(command, check=True, capture_output=True, text=True, env=env, creationflags=subprocess.CREATE_NO_WINDOW)
-
-            print(result.stdout)
+    def start_processing(self):
+        # imported here so check_and_install_packages can run before openpyxl/pandas are needed
+        from job_runner import ContractJob
 
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"Error occurred while executing {script_name}.")
-            print(e.stderr)
-            return False
+        if self.job is not None and self.job.running():
+            return
 
-    def process_contracts(self):
         selected_directory = self.directory
 
         if not selected_directory:
@@ -182,33 +177,66 @@ class SimpleGUI:
         selected_indices = self.xlsx_listbox.curselection()
         xlsx_files = [self.xlsx_listbox.get(i) for i in selected_indices] if selected_indices else glob.glob(
             os.path.join(selected_directory, "*.xlsx"))
-
-        for file in xlsx_files:
-            file_path = os.path.join(selected_directory, file)
-            self.update_status_label(f"Processing: {os.path.basename(file)}")
-            success = self.run_script('contract_parser.py', file_path)
-            if not success:
-                messagebox.showerror("Error", f"Failed to parse {os.path.basename(file_path)}", parent=self.root)
-                self.update_status_label("")
-                return
-
-        self.update_status_label("Centralizing parsed files...")
-        success_centralize = self.run_script('contract_exporter.py', selected_directory)
+        xlsx_paths = [os.path.join(selected_directory, file) for file in xlsx_files]
+
+        # the job runs on its own thread and only posts events: Tk is updated from poll_job, in the main loop
+        self.job = ContractJob(xlsx_paths)
+        self.parsed_count = 0
+        self.process_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.cancel_button.pack(side=tk.LEFT, padx=5, anchor='center')
+        self.update_status_label(f"Checking {len(xlsx_paths)} contract(s) for changes...")
+        self.job.start()
+        self.root.after(JOB_POLL_INTERVAL_MS, self.poll_job)
+
+    def cancel_processing(self):
+        if self.job is not None and self.job.running():
+            self.job.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.update_status_label("Cancelling, waiting for the contracts being parsed...")
+
+    def poll_job(self):
+        for event in self.job.poll():
+            self.handle_job_event(event)
+        if self.job is not None:
+            self.root.after(JOB_POLL_INTERVAL_MS, self.poll_job)
+
+    def handle_job_event(self, event):
+        if event["event"] == "contract":
+            self.parsed_count += 1
+            self.update_status_label(f"Parsed {self.parsed_count} changed contract(s): {event['file']}")
+        elif event["event"] == "parsed" and event["changed"]:
+            print(f"Parsed {event['changed']} contract(s) in {event['seconds']}s "
+                  f"({event['contracts_per_second']} contracts/s)")
+        elif event["event"] == "centralizing":
+            self.update_status_label("Centralizing parsed files...")
+        elif event["event"] == "done":
+            self.job_done(event)
+
+    def job_done(self, event):
+        self.job = None
         self.update_status_label("")
-        if success_centralize:
+        self.cancel_button.pack_forget()
+        self.process_button.config(state=tk.NORMAL)
+
+        if event["status"] == "ok":
             messagebox.showinfo("Success", "Processed contracts successfully!", parent=self.root)
-            self.update_xlsx_list()
-            self.update_tsv_list()
-            self.check_result_file()
+        elif event["status"] == "cancelled":
+            messagebox.showinfo("Cancelled", "Processing was cancelled, the remaining contracts were not parsed.",
+                                parent=self.root)
         else:
-            messagebox.showerror("Error", "Failed to centralize .tsv files to .xlsx.", parent=self.root)
+            messagebox.showerror("Error", event["error"], parent=self.root)
+        self.update_xlsx_list()
+        self.update_tsv_list()
+        self.check_result_file()
 
-    def start_processing(self):
-        threading.Thread(target=self.process_contracts).start()
+    def close(self):
+        if self.job is not None and self.job.running():
+            self.job.cancel()
+        self.root.destroy()
 
     def update_status_label(self, text):
         self.status_label.config(text=text)
-        self.root.update_idletasks()
 
     def open_xlsx_file(self, event):
         selection = self.xlsx_listbox.curselection()
@@ -257,6 +285,8 @@ class SimpleGUI:
 
 
 if __name__ == "__main__":
+    # the frozen (PyInstaller) exe is also started for each parsing process: run the worker, not the GUI
+    multiprocessing.freeze_support()
     if os.getenv('RUNNING_AS_SUBPROCESS'):
         print("Called as a subprocess, not launching GUI.")
     else:
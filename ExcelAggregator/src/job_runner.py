@@ -0,0 +1,102 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+import contract_batch
+import contract_exporter
+
+# one core is left to the GUI and the thread collecting the results
+DEFAULT_MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+
+class ContractJob:
+    # parses and centralizes contracts on a background thread. progress is only posted to self.events
+    # as {"event": ...} dicts, the same events as aggregate.py: the caller reads them with poll() from
+    # its own thread (Tk's main loop), as Tk must not be called from another thread
+    def __init__(self, xlsx_paths, max_workers=None, centralize=True, force=False):
+        self.xlsx_paths = list(xlsx_paths)
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.centralize = centralize
+        self.force = force
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="contract-job", daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        # contracts already being parsed finish, the others are left for the next run
+        self.cancel_event.set()
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def poll(self):
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def post(self, event, **fields):
+        fields["event"] = event
+        self.events.put(fields)
+
+    def run(self):
+        started = time.perf_counter()
+        self.post("start", contracts=len(self.xlsx_paths), jobs=self.max_workers)
+
+        def on_progress(xlsx_path, result):
+            self.post("contract", file=os.path.basename(xlsx_path), status="error" if result["error"] else "ok",
+                      seconds=result["seconds"], error=result["error"], tsv=result["tsv"])
+
+        try:
+            results = contract_batch.parse_changed_contracts(self.xlsx_paths, self.max_workers, on_progress,
+                                                             self.force, self.cancel_event)
+        except SystemExit:
+            self.post("done", status="error", error="No pack reference or channels.tsv file found in 'inputs'.")
+            return
+        except Exception as e:
+            logging.exception("Parsing failed")
+            self.post("done", status="error", error=f"{type(e).__name__}: {e}")
+            return
+
+        failed = contract_batch.failed_contracts(results)
+        parse_seconds = time.perf_counter() - started
+        self.post("parsed", contracts=len(self.xlsx_paths), changed=len(results), failed=len(failed),
+                  seconds=round(parse_seconds, 3),
+                  contracts_per_second=round(len(results) / parse_seconds, 2) if results else None)
+
+        if self.cancelled():
+            self.post("done", status="cancelled", failed=[os.path.basename(path) for path in failed],
+                      seconds=round(time.perf_counter() - started, 3))
+            return
+        if failed:
+            self.post("done", status="error", failed=[os.path.basename(path) for path in failed],
+                      error=f"Failed to parse {', '.join(map(os.path.basename, failed))}",
+                      seconds=round(time.perf_counter() - started, 3))
+            return
+
+        status = "ok"
+        error = None
+        if self.centralize:
+            self.post("centralizing")
+            centralize_started = time.perf_counter()
+            try:
+                contract_count = contract_exporter.main()
+                self.post("centralized", output=contract_exporter.OUTPUT_FILE, contracts=contract_count,
+                          seconds=round(time.perf_counter() - centralize_started, 3))
+            except Exception as e:
+                logging.exception("Centralization failed")
+                status = "error"
+                error = f"Failed to centralize .tsv files to .xlsx: {e}"
+
+        self.post("done", status=status, failed=[], error=error, seconds=round(time.perf_counter() - started, 3))
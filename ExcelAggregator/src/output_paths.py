@@ -0,0 +1,9 @@
+import os
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+# every generated file (tsv, records, manifest, templates, xlsx) lives under this directory.
+# set EXCELAGGREGATOR_OUTPUT_DIR before importing this or any module using it to move it (aggregate.py --out);
+# parsing workers inherit it from the environment
+OUTPUT_DIR_ENV = 'EXCELAGGREGATOR_OUTPUT_DIR'
+OUTPUT_ROOT = os.path.abspath(os.environ.get(OUTPUT_DIR_ENV) or os.path.join(base_dir, 'outputs'))
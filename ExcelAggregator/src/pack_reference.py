@@ -0,0 +1,101 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+from channel_recognizer import normalize_name
+from output_paths import OUTPUT_ROOT
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+REFERENCE_DATA_DIR = os.path.join(base_dir, 'inputs')
+# deduplicated pack names of each reference file read so far, keyed by the file's SHA-1:
+# the product grouping workbook is only opened again when its content changes
+SNAPSHOT_FILE = os.path.join(OUTPUT_ROOT, 'pack_reference.json')
+MAX_SNAPSHOTS = 10
+
+_loaded_packs = {}
+
+
+def file_hash(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_pack_reference():
+    latest_files = glob.glob(os.path.join(REFERENCE_DATA_DIR, 'Product_Grouping_Latest*.xlsx'))
+    if latest_files:
+        return max(latest_files, key=os.path.getctime)
+
+    packs_tv_file = os.path.join(REFERENCE_DATA_DIR, 'packsTV.tsv')
+    if os.path.exists(packs_tv_file):
+        return packs_tv_file
+    return None
+
+
+def read_pack_names(reference_file):
+    if reference_file.endswith('.xlsx'):
+        df = pd.read_excel(reference_file, usecols=['PROD_MSY_GRP'])
+    else:
+        df = pd.read_csv(reference_file, sep='\t')
+    return df['PROD_MSY_GRP'].tolist()
+
+
+def unique_pack_names(names):
+    packs = []
+    seen = set()
+    for name in names:
+        if not isinstance(name, str) or not name.strip():
+            continue
+        key = normalize_name(name)
+        if key not in seen:
+            seen.add(key)
+            packs.append(name.strip())
+    return packs
+
+
+def read_snapshots():
+    try:
+        with open(SNAPSHOT_FILE, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Ignoring unreadable pack reference snapshot {SNAPSHOT_FILE}: {e}")
+        return {}
+
+
+def save_snapshot(sha1, reference_file, packs):
+    snapshots = read_snapshots()
+    snapshots.pop(sha1, None)
+    snapshots[sha1] = {"file": os.path.basename(reference_file), "packs": packs}
+    snapshots = dict(list(snapshots.items())[-MAX_SNAPSHOTS:])
+
+    os.makedirs(os.path.dirname(SNAPSHOT_FILE), exist_ok=True)
+    temp_path = f"{SNAPSHOT_FILE}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(snapshots, file, ensure_ascii=False)
+    os.replace(temp_path, SNAPSHOT_FILE)
+
+
+def load_pack_file(reference_file):
+    sha1 = file_hash(reference_file)
+    if sha1 in _loaded_packs:
+        return _loaded_packs[sha1]
+
+    snapshot = read_snapshots().get(sha1)
+    if snapshot:
+        packs = snapshot["packs"]
+    else:
+        logging.info(f"Reading pack reference {reference_file}")
+        packs = unique_pack_names(read_pack_names(reference_file))
+        save_snapshot(sha1, reference_file, packs)
+
+    _loaded_packs[sha1] = packs
+    return packs
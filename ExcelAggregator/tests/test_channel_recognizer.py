@@ -0,0 +1,58 @@
+import pytest
+
+import contract_parser
+from channel_recognizer import ChannelRecognizer, ReferenceIndex
+
+PACKS = ["Pickx Sports", "Pickx All Stars & Sports", "VOO Basic TV", "Play"]
+CHANNELS = ["Discovery Channel", "Discovery Channel HD FR", "Discovery Channel HD NL", "Eurosport 1",
+            "Eurosport 2", "Play4"]
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    index = ReferenceIndex(CHANNELS)
+    assert index.match("  discovery   CHANNEL ") == ("Discovery Channel", 100.0)
+    assert index.match("Eurosport-1") == ("Eurosport 1", 100.0)
+
+
+def test_fuzzy_match_of_a_misspelled_name():
+    index = ReferenceIndex(CHANNELS)
+    name, score = index.match("Discovry Channel")
+    assert name == "Discovery Channel"
+    assert 90 <= score < 100
+    assert index.match("Discovry Channel", fuzzy=False) is None
+
+
+def test_numbers_must_match_exactly():
+    index = ReferenceIndex(CHANNELS)
+    assert index.match("Eurosport 3") is None
+    assert index.match("Eurosprt 2")[0] == "Eurosport 2"
+
+
+def test_definition_and_language_suffixes_must_match_exactly():
+    index = ReferenceIndex(CHANNELS)
+    assert index.match("Discovery Channel HD NL")[0] == "Discovery Channel HD NL"
+    assert index.match("Discovery Channel SD NL") is None
+    assert index.match("Discovery Chanel HD FR")[0] == "Discovery Channel HD FR"
+
+
+def test_recognize_groups_packs_under_their_channel():
+    recognizer = ChannelRecognizer(PACKS, CHANNELS)
+    channels = recognizer.recognize(["Eurosport 1", "Pickx Sports", "Play4", "VOO Basic TV", "Play",
+                                     "Discovery Channel HD NL", "Pickx All Stars & Sports"])
+    assert [(channel["channel"], channel["packs"]) for channel in channels] == [
+        ("Eurosport 1", ["Pickx Sports"]),
+        ("Play4", ["Play", "VOO Basic TV"]),
+        ("Discovery Channel HD NL", ["Pickx All Stars & Sports"]),
+    ]
+
+
+def test_unknown_combined_pack_is_split():
+    recognizer = ChannelRecognizer(PACKS, CHANNELS)
+    channels = recognizer.recognize(["Play4", "Play & VOO Basic TV"])
+    assert channels[0]["packs"] == ["Play", "VOO Basic TV"]
+
+
+def test_missing_channel_file_stops_the_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(contract_parser, "REFERENCE_DATA_DIR", str(tmp_path))
+    with pytest.raises(SystemExit):
+        contract_parser.load_channel_reference()